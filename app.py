@@ -6,19 +6,81 @@ Azure Log Analytics workspaces using Azure credentials.
 """
 
 import os
+import re
+import base64
 import json
+import random
+import logging
+import functools
 import time
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from flask import Flask, render_template, request, jsonify
+from tempfile import TemporaryFile
+import httpx
+import numpy as np
+import orjson
+from cachetools import TTLCache
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
+from werkzeug.exceptions import RequestEntityTooLarge
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from monitor_client import AzureMonitorAgent
+from openai import APIConnectionError, APITimeoutError, AzureOpenAI, InternalServerError, RateLimitError
+from monitor_client import AzureMonitorAgent, arrow_column
+
+try:  # Optional: Arrow IPC responses from /api/query
+    import pyarrow as pa  # type: ignore
+except Exception:  # pragma: no cover - JSON responses only
+    pa = None  # type: ignore
+
+try:  # Optional: HTTP/2 for Azure OpenAI calls (httpx[http2])
+    import h2  # type: ignore  # noqa: F401
+except Exception:  # pragma: no cover - HTTP/1.1 only
+    h2 = None  # type: ignore
 
 # Load environment variables
 load_dotenv()
 
+# Set LOG_LEVEL=WARNING in production to silence per-judge progress logs
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
+
+
+def _json_default(obj):
+    """orjson fallback: iterable SDK objects (e.g. LogsTableRow) become lists, anything else str()."""
+    if hasattr(obj, "__iter__") and not isinstance(obj, (str, bytes, dict)):
+        return list(obj)
+    return str(obj)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (used by `jsonify` and `request.get_json`)."""
+
+    # numpy scalars and arrays from the scoring code encode as numbers, not
+    # via the str() fallback
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_json_default, option=self._OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+app.json = OrjsonProvider(app)
+# Set FLASK_SECRET_KEY in production so every worker signs sessions with the
+# same key; the random per-process key is only suitable for local development.
+app.secret_key = os.getenv("FLASK_SECRET_KEY") or os.urandom(24)
+
+# Compress responses; query result rows repeat the same values heavily
+app.config["COMPRESS_ALGORITHM"] = ["br", "zstd", "gzip"]
+app.config["COMPRESS_LEVEL"] = 4
+app.config["COMPRESS_MIN_SIZE"] = 1024
+Compress(app)
 
 # Default workspace ID (can be overridden in the UI)
 DEFAULT_WORKSPACE_ID = os.getenv("AZURE_LOG_ANALYTICS_WORKSPACE_ID", "")
@@ -29,30 +91,81 @@ AI_MODELS = {
         "name": "GPT-4",
         "deployment": "gpt-4",
         "endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
-        "key": os.getenv("AZURE_OPENAI_KEY")
+        "key": os.getenv("AZURE_OPENAI_KEY"),
+        "supports_system": True,
+        "explain_kwargs": {"max_tokens": 1000, "temperature": 0.7},
+        "judge_kwargs": {"max_tokens": 800, "temperature": 0.3}
     },
     "gpt-4.1-nano": {
         "name": "GPT-4.1 Nano",
         "deployment": "gpt-4.1-nano",
         "endpoint": os.getenv("AZURE_OPENAI_ENDPOINT_2"),
-        "key": os.getenv("AZURE_OPENAI_KEY_2")
+        "key": os.getenv("AZURE_OPENAI_KEY_2"),
+        "supports_system": True,
+        "explain_kwargs": {"max_tokens": 1000, "temperature": 0.7},
+        "judge_kwargs": {"max_tokens": 800, "temperature": 0.3}
     },
     "gpt-5.2-chat": {
         "name": "GPT-5.2 Chat",
         "deployment": "gpt-5.2-chat",
         "endpoint": os.getenv("AZURE_OPENAI_ENDPOINT_2"),
-        "key": os.getenv("AZURE_OPENAI_KEY_2")
+        "key": os.getenv("AZURE_OPENAI_KEY_2"),
+        # Newer chat models take max_completion_tokens
+        "supports_system": True,
+        "explain_kwargs": {"max_completion_tokens": 1000},
+        "judge_kwargs": {"max_completion_tokens": 800}
     },
     "o4-mini": {
         "name": "O4 Mini",
         "deployment": "o4-mini",
         "endpoint": os.getenv("AZURE_OPENAI_ENDPOINT_2"),
-        "key": os.getenv("AZURE_OPENAI_KEY_2")
+        "key": os.getenv("AZURE_OPENAI_KEY_2"),
+        # O-series: no system message or temperature, longer completions
+        "supports_system": False,
+        "explain_kwargs": {"max_completion_tokens": 4000},
+        "judge_kwargs": {"max_completion_tokens": 1500}
     }
 }
 
 DEFAULT_MODEL = "gpt-4"
 
+# Models whose endpoint and key are set; env is read once at import
+CONFIGURED_MODELS = {
+    model_id: config
+    for model_id, config in AI_MODELS.items()
+    if config.get("endpoint") and config.get("key")
+}
+
+
+# Browsers may reuse static JSON for this long before revalidating with the ETag
+STATIC_JSON_MAX_AGE = 3600
+
+
+def _static_json(obj):
+    """Serialize a process-lifetime constant once, returning (body, etag)."""
+    body = orjson.dumps(obj)
+    return body, hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def _static_json_response(static):
+    """Serve a `_static_json` payload, answering 304 when the client's ETag matches."""
+    body, etag = static
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = STATIC_JSON_MAX_AGE
+    return response.make_conditional(request)
+
+
+# Model list is fixed for the lifetime of the process (env is read at import)
+_MODELS_JSON = _static_json({
+    "models": [
+        {"id": model_id, "name": config["name"]}
+        for model_id, config in CONFIGURED_MODELS.items()
+    ],
+    "default": DEFAULT_MODEL
+})
+
 # Audience-specific weight configurations
 AUDIENCE_WEIGHTS = {
     "developer": {
@@ -93,39 +206,71 @@ AUDIENCE_WEIGHTS = {
     }
 }
 
-def get_calibration_examples(audience):
-    """Get audience-specific calibration examples for scoring."""
-    examples = {
-        "developer": """
+# Audience-specific calibration examples for the judge prompt
+CALIBRATION_EXAMPLES = {
+    "developer": """
 **Example of Score 5 (Faithfulness):** "The query returned 247 failed requests with ResultCode 500, representing 12% of total requests. The top affected endpoint is /api/users with 89 failures."
 
 **Example of Score 3 (Faithfulness):** "The query shows several failed requests. This might indicate a server issue that should be investigated."
 
 **Example of Score 1 (Faithfulness):** "The high failure rate of 45% (note: actual data shows 12%) is likely caused by database connection issues (no database mentioned in query)."
 """,
-        "sre": """
+    "sre": """
 **Example of Score 5 (Actionability):** "1. Check application logs for endpoint /api/users between 14:00-15:00 UTC. 2. Review recent deployments in that timeframe. 3. Examine database query performance for user lookup operations."
 
 **Example of Score 3 (Actionability):** "You should investigate the failed requests and check if there are any patterns."
 
 **Example of Score 1 (Actionability):** "The system seems to have some issues."
 """,
-        "analyst": """
+    "analyst": """
 **Example of Score 5 (Analysis Depth):** "The temporal pattern shows failures spiking at 14:23 UTC (89 failures in 5 minutes), then declining. This correlates with increased traffic from region West-US-2, suggesting a regional load issue rather than code defect."
 
 **Example of Score 3 (Analysis Depth):** "There are 247 failures shown in the data, with most happening in the afternoon hours."
 
 **Example of Score 1 (Analysis Depth):** "The query shows: 247 rows of failed requests."
 """,
-        "executive": """
+    "executive": """
 **Example of Score 5 (Clarity):** "**Status:** Service degradation detected. **Impact:** 12% of user requests failed today. **Root Cause:** API endpoint overload. **Timeline:** Issue started 2:23 PM, resolved by 3:15 PM."
 
 **Example of Score 3 (Clarity):** "The KQL query filtered Requests table for Success==false and got 247 results with various ResultCodes."
 
 **Example of Score 1 (Clarity):** "By using the where clause to filter on the Success boolean and then aggregating with summarize by ResultCode, we can see the distribution of HTTP status codes..."
 """
-    }
-    return examples.get(audience, examples["developer"])
+}
+
+
+def normalize_audience(audience):
+    """Map a client-supplied audience to a preset name (unknown, null or non-string values use developer)."""
+    return audience if isinstance(audience, str) and audience in AUDIENCE_WEIGHTS else "developer"
+
+def get_calibration_examples(audience):
+    """Get audience-specific calibration examples for scoring."""
+    return CALIBRATION_EXAMPLES.get(audience, CALIBRATION_EXAMPLES["developer"])
+
+# Scoring dimensions, in the order used for score matrices
+DIMENSIONS = ["faithfulness", "structure", "clarity", "analysisDepth", "contextAccuracy", "actionability", "conciseness"]
+
+# AUDIENCE_WEIGHTS as vectors aligned with DIMENSIONS, for one-shot dot products
+AUDIENCE_WEIGHT_VECTORS = {
+    audience: np.array([weights[dim] for dim in DIMENSIONS], dtype=np.float64)
+    for audience, weights in AUDIENCE_WEIGHTS.items()
+}
+
+
+def weighted_score(scores, audience):
+    """Audience-weighted average of per-dimension scores (unknown audiences use developer)."""
+    weights = AUDIENCE_WEIGHT_VECTORS.get(audience, AUDIENCE_WEIGHT_VECTORS["developer"])
+    values = np.array([scores[dim] for dim in DIMENSIONS], dtype=np.float64)
+    return float(weights @ values / weights.sum())
+
+
+def _score_matrix(all_judge_scores, dimensions):
+    """Judges x dimensions array of raw scores (a missing dimension counts as 3)."""
+    return np.array(
+        [[judge_data["scores"].get(dim, 3) for dim in dimensions] for judge_data in all_judge_scores],
+        dtype=np.float64
+    )
+
 
 def normalize_judge_scores(all_judge_scores, dimensions):
     """
@@ -136,97 +281,237 @@ def normalize_judge_scores(all_judge_scores, dimensions):
         return None  # Need at least 2 judges for normalization
     
     try:
-        import statistics
-        
-        # Calculate each judge's mean and std across all dimensions
-        judge_stats = {}
-        for judge_data in all_judge_scores:
-            model = judge_data["model"]
-            scores = [judge_data["scores"].get(dim, 3) for dim in dimensions]
-            judge_stats[model] = {
-                "mean": statistics.mean(scores),
-                "std": statistics.stdev(scores) if len(scores) > 1 and statistics.stdev(scores) > 0 else 1.0
-            }
-        
-        # Normalize each judge's scores (z-score)
-        normalized_by_judge = {}
-        for judge_data in all_judge_scores:
-            model = judge_data["model"]
-            stats = judge_stats[model]
-            normalized_by_judge[model] = {}
-            
-            for dim in dimensions:
-                raw_score = judge_data["scores"].get(dim, 3)
-                # Z-score: (x - mean) / std
-                z_score = (raw_score - stats["mean"]) / stats["std"]
-                normalized_by_judge[model][dim] = z_score
-        
-        # Calculate global mean and std across all normalized scores
-        all_normalized_scores = []
-        for dim in dimensions:
-            for model in normalized_by_judge:
-                all_normalized_scores.append(normalized_by_judge[model][dim])
-        
-        global_mean = statistics.mean(all_normalized_scores)
-        global_std = statistics.stdev(all_normalized_scores) if len(all_normalized_scores) > 1 else 1.0
-        
-        # Rescale to 1-5 range and average across judges
-        final_scores = {}
-        for dim in dimensions:
-            dim_scores = []
-            for model in normalized_by_judge:
-                z_score = normalized_by_judge[model][dim]
-                # Rescale: mean=3, std≈1 in 1-5 range
-                rescaled = 3 + z_score
-                # Clamp to 1-5 range
-                rescaled = max(1, min(5, rescaled))
-                dim_scores.append(rescaled)
-            
-            final_scores[dim] = sum(dim_scores) / len(dim_scores)
-        
-        return final_scores
+        raw = _score_matrix(all_judge_scores, dimensions)
+
+        # Each judge's mean and std across all dimensions (std of 0 -> 1.0)
+        means = raw.mean(axis=1, keepdims=True)
+        if raw.shape[1] > 1:
+            stds = raw.std(axis=1, ddof=1, keepdims=True)
+            stds[stds == 0] = 1.0
+        else:
+            stds = np.ones_like(means)
+
+        # Z-score per judge, rescale to mean=3 (std≈1), clamp to 1-5, average across judges
+        rescaled = np.clip(3.0 + (raw - means) / stds, 1.0, 5.0)
+        return dict(zip(dimensions, rescaled.mean(axis=0).tolist()))
     
     except Exception as e:
-        print(f"[NORMALIZE] Error normalizing scores: {e}")
+        logger.warning("[NORMALIZE] Error normalizing scores: %s", e)
         return None  # Fall back to raw averaging
 
-def get_openai_client(model_id):
-    """Get an OpenAI client for the specified model."""
-    model_config = AI_MODELS.get(model_id)
-    if not model_config:
-        return None, None
-    
-    endpoint = model_config.get("endpoint")
-    key = model_config.get("key")
-    deployment = model_config.get("deployment")
-    
-    if not endpoint or not key:
-        return None, None
-    
+_monitor_agent = None
+_monitor_agent_lock = threading.Lock()
+
+
+def get_monitor_agent():
+    """Get the shared Azure Monitor agent, creating it on first use.
+
+    The agent's credential and LogsQueryClient (with its connection pool) are
+    reused across requests; the Azure SDK clients are thread-safe.
+    """
+    global _monitor_agent
+    if _monitor_agent is None:
+        with _monitor_agent_lock:
+            if _monitor_agent is None:
+                _monitor_agent = AzureMonitorAgent()
+    return _monitor_agent
+
+@functools.lru_cache(maxsize=len(AI_MODELS))
+def _build_openai_client(model_id):
+    """Build the AzureOpenAI client for a configured model (cached per model_id).
+
+    Each client keeps its own pooled httpx connections so keep-alive sockets
+    are reused across requests instead of re-doing the TLS handshake. With h2
+    installed, concurrent judge calls to one endpoint share a multiplexed
+    HTTP/2 connection.
+    """
+    model_config = CONFIGURED_MODELS[model_id]
     client = AzureOpenAI(
-        azure_endpoint=endpoint,
-        api_key=key,
+        azure_endpoint=model_config["endpoint"],
+        api_key=model_config["key"],
         api_version="2025-01-01-preview",
-        timeout=60.0  # 60 second timeout
+        timeout=60.0,  # 60 second timeout
+        http_client=httpx.Client(
+            http2=h2 is not None,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+        )
     )
-    return client, deployment
+    return client, model_config["deployment"]
+
+def get_openai_client(model_id):
+    """Get an OpenAI client for the specified model, or (None, None) if it isn't configured."""
+    if model_id not in CONFIGURED_MODELS:
+        return None, None
+    return _build_openai_client(model_id)
+
+
+def warm_openai_clients():
+    """Build every configured model's client up front so no request pays the init cost.
+
+    Called per worker after fork (see gunicorn.conf.py), never at import, so
+    connection pools are not shared across processes.
+    """
+    for model_id in CONFIGURED_MODELS:
+        _build_openai_client(model_id)
+
+
+@functools.lru_cache(maxsize=1)
+def _index_html():
+    """Render index.html once; its only variable is fixed at startup."""
+    return render_template("index.html", default_workspace_id=DEFAULT_WORKSPACE_ID)
 
 
 @app.route("/")
 def index():
     """Render the main query interface."""
-    return render_template("index.html", default_workspace_id=DEFAULT_WORKSPACE_ID)
+    return Response(_index_html(), mimetype="text/html")
 
 
 @app.route("/api/models")
 def get_models():
     """Return available AI models."""
-    models = [
-        {"id": model_id, "name": config["name"]}
-        for model_id, config in AI_MODELS.items()
-        if config.get("endpoint") and config.get("key")
-    ]
-    return jsonify({"models": models, "default": DEFAULT_MODEL})
+    return _static_json_response(_MODELS_JSON)
+
+
+# Rows serialized per chunk when streaming /api/query responses
+QUERY_STREAM_CHUNK_ROWS = 1000
+
+
+def _stream_query_tables(processed_tables, total_rows, truncated=False):
+    """Yield the /api/query JSON body incrementally, one chunk of rows at a time.
+
+    Produces the same document as jsonify({"success", "tables", "total_rows",
+    "truncated"}) without ever holding the whole serialized payload in memory.
+    """
+    yield b'{"success":true,"tables":['
+    for i, table in enumerate(processed_tables):
+        rows = table["rows"]
+        header = orjson.dumps({
+            "name": table["name"],
+            "columns": table["columns"],
+            "row_count": table["row_count"]
+        }, default=_json_default)
+        # Re-open the header object to append the "rows" array
+        yield (b"," if i else b"") + header[:-1] + b',"rows":['
+        for start in range(0, len(rows), QUERY_STREAM_CHUNK_ROWS):
+            chunk = orjson.dumps(rows[start:start + QUERY_STREAM_CHUNK_ROWS], default=_json_default)
+            yield (b"," if start else b"") + chunk[1:-1]
+        yield b"]}"
+    yield b'],"total_rows":' + str(total_rows).encode() + b',"truncated":' + (b"true" if truncated else b"false") + b"}"
+
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def _stream_query_ndjson(processed_tables):
+    """Yield tables as NDJSON: a header object per table, then one array line per row.
+
+    Lets clients parse rows line by line as they arrive instead of waiting for
+    the closing bracket of the JSON document.
+    """
+    for table in processed_tables:
+        yield orjson.dumps({
+            "name": table["name"],
+            "columns": table["columns"],
+            "row_count": table["row_count"]
+        }, default=_json_default, option=orjson.OPT_APPEND_NEWLINE)
+        rows = table["rows"]
+        for start in range(0, len(rows), QUERY_STREAM_CHUNK_ROWS):
+            yield b"".join(
+                orjson.dumps(row, default=_json_default, option=orjson.OPT_APPEND_NEWLINE)
+                for row in rows[start:start + QUERY_STREAM_CHUNK_ROWS]
+            )
+
+
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+def _query_tables_to_arrow(processed_tables):
+    """Serialize tables as concatenated Arrow IPC streams, one stream per table.
+
+    Each stream's schema carries the table name in its metadata; readers such
+    as apache-arrow's `RecordBatchReader.readAll()` iterate the streams in order.
+    """
+    sink = pa.BufferOutputStream()
+    for table in processed_tables:
+        columns = [str(c) for c in table["columns"]]
+        values = list(zip(*table["rows"])) if table["rows"] else [()] * len(columns)
+        arrow_table = pa.Table.from_arrays(
+            [arrow_column(list(col)) for col in values], names=columns
+        ).replace_schema_metadata({"name": str(table["name"])})
+        with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+    return sink.getvalue().to_pybytes()
+
+
+# Row budget for one query response; callers may pass "max_rows" up to the limit
+QUERY_MAX_ROWS = 10000
+QUERY_MAX_ROWS_LIMIT = 100000
+_RENDER_RE = re.compile(r"\|\s*render\b", re.IGNORECASE)
+
+
+def _parse_max_rows(value):
+    """Clamp a requested row budget to [1, QUERY_MAX_ROWS_LIMIT]; None if it isn't a number."""
+    try:
+        return min(max(int(value), 1), QUERY_MAX_ROWS_LIMIT)
+    except (TypeError, ValueError):
+        return None
+
+
+def _limit_query(kql_query, max_rows):
+    """Append `| take max_rows+1` so the service never ships rows we would drop.
+
+    The extra row is how truncation is detected. Queries using `render` are
+    sent unchanged, since that operator has to stay last.
+    """
+    if _RENDER_RE.search(kql_query):
+        return kql_query
+    return f"{kql_query.rstrip().rstrip(';')}\n| take {max_rows + 1}"
+
+
+def _process_query_tables(tables, max_rows=None):
+    """Normalize agent result tables to {name, columns, rows, row_count} dicts.
+
+    With max_rows, rows beyond the budget (across all tables) are dropped.
+    Returns (processed_tables, total_rows, truncated).
+    """
+    processed_tables = []
+    total_rows = 0
+    truncated = False
+
+    for table in tables:
+        # Accept both our dict tables and raw SDK LogsTable objects. Rows are
+        # passed through untouched: SDK row objects are converted to lists by
+        # the serializer's default hook, so no per-row copy is made here.
+        if isinstance(table, dict):
+            name = table.get("name", "Result")
+            columns = table.get("columns", [])
+            rows = table.get("rows", [])
+        else:
+            name = getattr(table, "name", "Result")
+            columns = getattr(table, "columns", [])
+            rows = getattr(table, "rows", [])
+
+        if max_rows is not None and total_rows + len(rows) > max_rows:
+            rows = rows[:max_rows - total_rows]
+            truncated = True
+
+        processed_tables.append({
+            "name": name,
+            "columns": columns,
+            "rows": rows,
+            "row_count": len(rows)
+        })
+        total_rows += len(rows)
+
+    return processed_tables, total_rows, truncated
+
+
+# Query results keyed by (workspace, timespan, query) digest; pass ?nocache=1
+# to bypass. The timespan is relative to now, so a short TTL keeps results fresh.
+QUERY_CACHE_TTL_SECONDS = 60
+_query_cache = TTLCache(maxsize=128, ttl=QUERY_CACHE_TTL_SECONDS)
+_query_cache_lock = threading.Lock()
 
 
 @app.route("/api/query", methods=["POST"])
@@ -237,6 +522,9 @@ def execute_query():
         workspace_id = data.get("workspace_id", "").strip()
         kql_query = data.get("query", "").strip()
         timespan_hours = data.get("timespan_hours", 1)
+        max_rows = _parse_max_rows(data.get("max_rows", QUERY_MAX_ROWS))
+        if max_rows is None:
+            return jsonify({"error": "max_rows must be an integer"}), 400
 
         if not workspace_id:
             return jsonify({"error": "Workspace ID is required"}), 400
@@ -244,53 +532,123 @@ def execute_query():
         if not kql_query:
             return jsonify({"error": "Query is required"}), 400
 
-        # Create Azure Monitor agent with default credentials
-        agent = AzureMonitorAgent()
+        # Reuse the shared Azure Monitor agent (default credentials)
+        agent = get_monitor_agent()
 
         # Set up timespan
         timespan = timedelta(hours=int(timespan_hours))
 
-        # Execute the query
-        result = agent.query_log_analytics(
-            workspace_id=workspace_id,
-            kql_query=kql_query,
-            timespan=timespan
-        )
+        # Repeated refreshes of the same query within the TTL reuse the result
+        cache_key = hashlib.blake2b(
+            f"{workspace_id}|{int(timespan_hours)}|{max_rows}|{kql_query}".encode(), digest_size=16
+        ).digest()
+        result = None
+        if request.args.get("nocache") != "1":
+            with _query_cache_lock:
+                result = _query_cache.get(cache_key)
+
+        if result is None:
+            # Execute the query
+            result = agent.query_log_analytics(
+                workspace_id=workspace_id,
+                kql_query=_limit_query(kql_query, max_rows),
+                timespan=timespan
+            )
 
-        if "error" in result:
-            return jsonify({"error": result["error"]}), 400
+            if "error" in result:
+                return jsonify({"error": result["error"]}), 400
+
+            with _query_cache_lock:
+                _query_cache[cache_key] = result
 
         # Process tables for JSON response
-        tables = result.get("tables", [])
-        processed_tables = []
-        total_rows = 0
+        processed_tables, total_rows, truncated = _process_query_tables(result.get("tables", []), max_rows)
+
+        # Columnar Arrow IPC or line-delimited JSON for clients that ask for
+        # them; a single JSON document stays the default
+        offered = ["application/json", NDJSON_MIMETYPE]
+        if pa is not None:
+            offered.append(ARROW_STREAM_MIMETYPE)
+        best = request.accept_mimetypes.best_match(offered)
+
+        if best == ARROW_STREAM_MIMETYPE:
+            response = Response(_query_tables_to_arrow(processed_tables), mimetype=ARROW_STREAM_MIMETYPE)
+            response.headers["X-Total-Rows"] = str(total_rows)
+            response.headers["X-Truncated"] = "true" if truncated else "false"
+            return response
+
+        if best == NDJSON_MIMETYPE:
+            response = Response(stream_with_context(_stream_query_ndjson(processed_tables)), mimetype=NDJSON_MIMETYPE)
+            response.headers["X-Total-Rows"] = str(total_rows)
+            response.headers["X-Truncated"] = "true" if truncated else "false"
+            return response
+
+        return Response(
+            stream_with_context(_stream_query_tables(processed_tables, total_rows, truncated)),
+            mimetype="application/json"
+        )
 
-        for table in tables:
-            # Convert rows to list of dicts for easier frontend consumption
-            columns = table.get("columns", [])
-            rows = table.get("rows", [])
-            
-            # Convert rows to list format if needed
-            processed_rows = []
-            for row in rows:
-                if hasattr(row, '__iter__') and not isinstance(row, (str, dict)):
-                    processed_rows.append(list(row))
-                else:
-                    processed_rows.append(row)
-
-            processed_tables.append({
-                "name": table.get("name", "Result"),
-                "columns": columns,
-                "rows": processed_rows,
-                "row_count": len(processed_rows)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Log Analytics accepts at most this many queries in one batch request
+QUERY_BATCH_MAX = 10
+
+
+@app.route("/api/query-batch", methods=["POST"])
+def execute_query_batch():
+    """Execute several KQL queries in one Log Analytics round-trip.
+
+    Accepts {"queries": [{"query", "workspace_id"?, "timespan_hours"?}, ...]};
+    top-level "workspace_id" / "timespan_hours" are used as per-query defaults
+    and "max_rows" caps each query's result.
+    Returns {"success", "results"} with one entry per query, in order.
+    """
+    try:
+        data = request.get_json()
+        queries = data.get("queries") or []
+        default_workspace_id = data.get("workspace_id", "").strip()
+        default_timespan_hours = data.get("timespan_hours", 1)
+        max_rows = _parse_max_rows(data.get("max_rows", QUERY_MAX_ROWS))
+        if max_rows is None:
+            return jsonify({"error": "max_rows must be an integer"}), 400
+
+        if not isinstance(queries, list) or not queries:
+            return jsonify({"error": "queries must be a non-empty list"}), 400
+
+        if len(queries) > QUERY_BATCH_MAX:
+            return jsonify({"error": f"At most {QUERY_BATCH_MAX} queries per batch"}), 400
+
+        batch = []
+        for i, item in enumerate(queries):
+            workspace_id = (item.get("workspace_id") or default_workspace_id).strip()
+            kql_query = item.get("query", "").strip()
+            if not workspace_id:
+                return jsonify({"error": f"Workspace ID is required (query {i})"}), 400
+            if not kql_query:
+                return jsonify({"error": f"Query is required (query {i})"}), 400
+            batch.append({
+                "workspace_id": workspace_id,
+                "kql_query": _limit_query(kql_query, max_rows),
+                "timespan": timedelta(hours=int(item.get("timespan_hours", default_timespan_hours)))
             })
-            total_rows += len(processed_rows)
 
-        return jsonify({
-            "success": True,
-            "tables": processed_tables,
-            "total_rows": total_rows
-        })
+        agent = get_monitor_agent()
+        results = []
+        for result in agent.query_log_analytics_batch(batch):
+            if "error" in result:
+                results.append({"success": False, "error": result["error"]})
+                continue
+            processed_tables, total_rows, truncated = _process_query_tables(result.get("tables", []), max_rows)
+            results.append({
+                "success": True,
+                "tables": processed_tables,
+                "total_rows": total_rows,
+                "truncated": truncated
+            })
+
+        return jsonify({"success": True, "results": results})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -306,7 +664,7 @@ def test_connection():
         if not workspace_id:
             return jsonify({"error": "Workspace ID is required"}), 400
 
-        agent = AzureMonitorAgent()
+        agent = get_monitor_agent()
         
         # Simple test query
         result = agent.query_log_analytics(
@@ -333,43 +691,14 @@ def test_connection():
         })
 
 
-@app.route("/api/benchmark/evaluate", methods=["POST"])
-def evaluate_explanation():
-    """Evaluate an explanation using multiple LLM judges."""
-    try:
-        data = request.get_json()
-        explanation = data.get("explanation", "")
-        test_case = data.get("testCase", {})
-        target_audience = data.get("targetAudience", "developer")
-
-        # Truncate explanation to prevent huge payloads (increased from 3000)
-        max_explanation_len = 5000
-        if len(explanation) > max_explanation_len:
-            explanation = explanation[:max_explanation_len] + "... [truncated]"
-        
-        # Limit result data size (increased from 5 to 10 rows)
-        results = test_case.get('results', {})
-        if 'rows' in results and len(results['rows']) > 10:
-            results = {**results, 'rows': results['rows'][:10]}
-        results_str = json.dumps(results, default=str)[:1200]
-
-        # Use multiple models as judges (including O4 Mini)
-        judge_models = ["gpt-4", "gpt-5.2-chat", "gpt-4.1-nano", "o4-mini"]
-        all_judge_scores = []
-        judge_notes = []
-
-        # Get audience-specific examples for calibration
-        audience_examples = get_calibration_examples(target_audience)
-        
-        evaluation_prompt = f"""You are an expert evaluator for Azure Log Analytics explanations. Your goal is to provide accurate, calibrated scores that differentiate quality.
+# Evaluation prompt, split so that only the per-request fields are interpolated.
+# The audience-dependent segments are rendered once per audience and cached.
+_EVALUATION_PROMPT_HEAD = """You are an expert evaluator for Azure Log Analytics explanations. Your goal is to provide accurate, calibrated scores that differentiate quality.
 
 ## Context
-- Target Audience: {target_audience}
-- KQL Query: {test_case.get('query', 'N/A')[:500]}
-- Result Data: {results_str}
+- Target Audience: """
 
-## Explanation to Evaluate:
-{explanation}
+_EVALUATION_PROMPT_TAIL = """
 
 ## Calibration Examples:
 {audience_examples}
@@ -445,158 +774,668 @@ Respond ONLY with valid JSON (no markdown):
     "evaluatorNotes": "<specific observations: what worked well, what needs improvement>"
 }}"""
 
-        # Get evaluations from each judge model
-        for judge_model in judge_models:
+
+@functools.lru_cache(maxsize=8)
+def _evaluation_prompt_segments(target_audience):
+    """Return the (head, tail) prompt segments for an audience."""
+    head = _EVALUATION_PROMPT_HEAD + target_audience + "\n- KQL Query: "
+    tail = _EVALUATION_PROMPT_TAIL.format(
+        target_audience=target_audience,
+        audience_examples=get_calibration_examples(target_audience)
+    )
+    return head, tail
+
+
+def build_evaluation_prompt(target_audience, query, results_str, explanation):
+    """Assemble the judge prompt from the cached segments and per-request fields."""
+    head, tail = _evaluation_prompt_segments(target_audience)
+    return "".join([
+        head, query, "\n- Result Data: ", results_str,
+        "\n\n## Explanation to Evaluate:\n", explanation, tail
+    ])
+
+
+# Use multiple models as judges (including O4 Mini)
+JUDGE_MODELS = ["gpt-4", "gpt-5.2-chat", "gpt-4.1-nano", "o4-mini"]
+
+# Judge calls for all in-flight evaluations. Kept separate from the batch
+# pool so batch cases waiting on their judges can never starve them.
+JUDGE_POOL_WORKERS = 32
+_judge_pool = ThreadPoolExecutor(max_workers=JUDGE_POOL_WORKERS)
+
+
+JUDGE_SYSTEM_PROMPT = "You are an expert evaluator. Respond only with valid JSON."
+_JUDGE_SYSTEM_MESSAGE = {"role": "system", "content": JUDGE_SYSTEM_PROMPT}
+# Models without system messages (o-series) get the instruction inlined
+_JUDGE_INLINE_PREFIX = f"{JUDGE_SYSTEM_PROMPT} No markdown code blocks.\n\n"
+
+
+def _judge_request(judge_model, evaluation_prompt):
+    """Build the chat.completions arguments (besides model) for one judge."""
+    config = AI_MODELS[judge_model]
+    if config["supports_system"]:
+        messages = [
+            _JUDGE_SYSTEM_MESSAGE,
+            {"role": "user", "content": evaluation_prompt}
+        ]
+    else:
+        messages = [{"role": "user", "content": _JUDGE_INLINE_PREFIX + evaluation_prompt}]
+    return {"messages": messages, **config["judge_kwargs"]}
+
+
+# Decodes the first complete JSON object in a judge reply, skipping code
+# fences, prose or stray braces before it
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _parse_judge_reply(response_text):
+    """Parse the first JSON object out of a judge's reply; raises ValueError if there is none.
+
+    Decodes one object from each '{' in turn, so prose or stray braces before
+    or after the object don't break parsing.
+    """
+    start = response_text.find("{")
+    while start != -1:
+        try:
+            return _JSON_DECODER.raw_decode(response_text, start)[0]
+        except ValueError:
+            start = response_text.find("{", start + 1)
+    raise ValueError("No JSON object in judge response")
+
+
+# Judge call attempts; rate limits, timeouts and 5xx are retried with backoff
+JUDGE_MAX_ATTEMPTS = 3
+JUDGE_RETRY_BASE_SECONDS = 1.0
+_TRANSIENT_OPENAI_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+# Parsed judge scores keyed by (judge_model, prompt digest), so re-evaluating
+# the same explanation skips the LLM calls; pass ?nocache=1 to bypass
+JUDGE_CACHE_TTL_SECONDS = 3600
+_judge_cache = TTLCache(maxsize=2000, ttl=JUDGE_CACHE_TTL_SECONDS)
+_judge_cache_lock = threading.Lock()
+
+
+def _run_judge(judge_model, evaluation_prompt, use_cache=True):
+    """Get one judge model's scores for an evaluation prompt.
+
+    Returns the parsed score dict, or None if the judge is not configured or fails.
+    Successful scores are cached; use_cache=False skips the lookup.
+    """
+    cache_key = (judge_model, hashlib.blake2b(evaluation_prompt.encode(), digest_size=16).digest())
+    if use_cache:
+        with _judge_cache_lock:
+            cached_scores = _judge_cache.get(cache_key)
+        if cached_scores is not None:
+            logger.debug("[MULTI-JUDGE] %s cache hit", judge_model)
+            return cached_scores
+
+    try:
+        openai_client, deployment = get_openai_client(judge_model)
+        if not openai_client:
+            logger.info("[MULTI-JUDGE] Skipping %s: not configured", judge_model)
+            return None
+
+        logger.debug("[MULTI-JUDGE] Getting evaluation from %s...", judge_model)
+
+        # This loop owns retries (empty replies and transient errors alike), so
+        # turn off the SDK's own retries to avoid multiplying attempts
+        judge_client = openai_client.with_options(max_retries=0)
+        request_kwargs = _judge_request(judge_model, evaluation_prompt)
+        response_text = None
+
+        for attempt in range(JUDGE_MAX_ATTEMPTS):
+            try:
+                response = judge_client.chat.completions.create(model=deployment, **request_kwargs)
+                response_text = response.choices[0].message.content
+                if response_text:
+                    break
+                logger.warning("[MULTI-JUDGE] %s returned empty response (attempt %d/%d)", judge_model, attempt + 1, JUDGE_MAX_ATTEMPTS)
+            except _TRANSIENT_OPENAI_ERRORS as transient_err:
+                if attempt == JUDGE_MAX_ATTEMPTS - 1:
+                    raise
+                logger.warning("[MULTI-JUDGE] %s transient error (attempt %d/%d): %s", judge_model, attempt + 1, JUDGE_MAX_ATTEMPTS, transient_err)
+            if attempt < JUDGE_MAX_ATTEMPTS - 1:
+                # Exponential backoff with jitter so concurrent judges don't retry in lockstep
+                time.sleep(JUDGE_RETRY_BASE_SECONDS * 2 ** attempt + random.random())
+
+        if not response_text:
+            logger.warning("[MULTI-JUDGE] %s failed after %d attempts", judge_model, JUDGE_MAX_ATTEMPTS)
+            return None
+            
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[MULTI-JUDGE] %s raw response: %s", judge_model, response_text.strip()[:300])
+
+        judge_scores = _parse_judge_reply(response_text)
+        logger.debug("[MULTI-JUDGE] %s scores parsed successfully", judge_model)
+        with _judge_cache_lock:
+            _judge_cache[cache_key] = judge_scores
+        return judge_scores
+
+    except Exception as judge_err:
+        logger.warning("[MULTI-JUDGE] Error from %s: %s", judge_model, judge_err)
+        return None
+
+
+# Limits on the result data shown to the judges (increased from 5 to 10 rows)
+JUDGE_RESULT_ROWS = 10
+JUDGE_RESULT_CELL_CHARS = 80
+JUDGE_RESULT_CHARS = 1200
+
+
+def _compact_results(results, char_budget=JUDGE_RESULT_CHARS):
+    """Serialize a bounded view of a test case's results for the judge prompt.
+
+    Cells are clipped and rows are added only while they fit the budget, so a
+    wide table is never serialized in full just to be sliced afterwards.
+    """
+    if not isinstance(results, dict) or not isinstance(results.get("rows"), list):
+        return orjson.dumps(results, default=str).decode()[:char_budget]
+
+    head = orjson.dumps({k: v for k, v in results.items() if k != "rows"}, default=str)
+    # Room left for the rows array once it is spliced into the head object
+    remaining = char_budget - len(head) - len(',"rows":[]')
+    if remaining <= 0:
+        return head.decode()[:char_budget]
+
+    parts = []
+    for row in results["rows"][:JUDGE_RESULT_ROWS]:
+        if isinstance(row, list):
+            row = [_truncate_cell(v, JUDGE_RESULT_CELL_CHARS) for v in row]
+        row_json = orjson.dumps(row, default=str)
+        if len(row_json) + 1 > remaining:
+            parts.append(b'"...truncated"')
+            break
+        parts.append(row_json)
+        remaining -= len(row_json) + 1
+
+    rows_json = b'"rows":[' + b",".join(parts) + b"]"
+    body = head[:-1] + (b"," if len(head) > 2 else b"") + rows_json + b"}"
+    return body.decode()
+
+
+def judge_evaluation_prompt(explanation, test_case, target_audience):
+    """Build the judge prompt for one case, bounding the explanation and result data."""
+    # Truncate explanation to prevent huge payloads (increased from 3000)
+    max_explanation_len = 5000
+    if len(explanation) > max_explanation_len:
+        explanation = explanation[:max_explanation_len] + "... [truncated]"
+    
+    results_str = _compact_results(test_case.get('results', {}))
+
+    return build_evaluation_prompt(
+        normalize_audience(target_audience), test_case.get('query', 'N/A')[:500], results_str, explanation
+    )
+
+
+def run_judge_evaluation(explanation, test_case, target_audience, use_cache=True):
+    """Score an explanation with the judge models and aggregate their scores.
+
+    Returns {"scores": ..., "individualJudges": ...}, or None if every judge failed.
+    """
+    target_audience = normalize_audience(target_audience)
+    evaluation_prompt = judge_evaluation_prompt(explanation, test_case, target_audience)
+
+    # Judges are independent, so ask them all at once; latency is the slowest judge
+    futures = [
+        _judge_pool.submit(_run_judge, judge_model, evaluation_prompt, use_cache)
+        for judge_model in JUDGE_MODELS
+    ]
+    all_judge_scores = [
+        {"model": judge_model, "scores": judge_scores}
+        for judge_model, judge_scores in zip(JUDGE_MODELS, (f.result() for f in futures))
+        if judge_scores is not None
+    ]
+    return aggregate_judge_scores(all_judge_scores, target_audience)
+
+
+def aggregate_judge_scores(all_judge_scores, target_audience="developer"):
+    """Combine per-judge scores ([{"model", "scores"}, ...]) into the final result.
+
+    Returns {"scores": ..., "individualJudges": ...}, or None if the list is empty.
+    """
+    # If no judges succeeded, there is nothing to aggregate
+    if not all_judge_scores:
+        return None
+
+    judge_notes = [
+        f"**{AI_MODELS[j['model']]['name']}**: {j['scores']['evaluatorNotes']}"
+        for j in all_judge_scores
+        if j["scores"].get("evaluatorNotes")
+    ]
+
+    # Calculate statistics and normalized scores
+    dimensions = DIMENSIONS
+    
+    # Calculate raw averages and per-dimension statistics for consensus checking
+    raw = _score_matrix(all_judge_scores, dimensions)
+    means = raw.mean(axis=0)
+    stds = raw.std(axis=0, ddof=1) if len(raw) > 1 else np.zeros(len(dimensions))
+    mins = raw.min(axis=0)
+    maxs = raw.max(axis=0)
+
+    raw_averaged_scores = dict(zip(dimensions, means.tolist()))
+    score_statistics = {
+        dim: {"mean": mean, "std": std, "min": lo, "max": hi, "range": hi - lo}
+        for dim, mean, std, lo, hi in zip(dimensions, means.tolist(), stds.tolist(), mins.tolist(), maxs.tolist())
+    }
+    
+    # Check for consensus issues (high disagreement)
+    high_disagreement_dims = [
+        dim for dim, stats in score_statistics.items() 
+        if stats["std"] > 1.0 or stats["range"] > 2
+    ]
+    
+    # Normalize scores (optional z-score normalization per judge)
+    normalized_scores = normalize_judge_scores(all_judge_scores, dimensions)
+    
+    # Final averaged scores (using normalized if available, otherwise raw)
+    averaged_scores = {}
+    for dim in dimensions:
+        if normalized_scores:
+            averaged_scores[dim] = round(normalized_scores[dim], 2)
+        else:
+            averaged_scores[dim] = round(raw_averaged_scores[dim], 2)
+    
+    # Preset weighting for the audience (the UI may re-weight with custom weights)
+    averaged_scores["weightedScore"] = round(weighted_score(averaged_scores, target_audience), 2)
+
+    # Add metadata
+    averaged_scores["evaluatorNotes"] = "\n\n".join(judge_notes) if judge_notes else "No detailed notes available"
+    averaged_scores["judgeCount"] = len(all_judge_scores)
+    averaged_scores["judges"] = [j["model"] for j in all_judge_scores]
+    averaged_scores["consensus"] = {
+        "highDisagreement": high_disagreement_dims,
+        "statistics": score_statistics
+    }
+    
+    # Calculate average confidence if available
+    confidences = [j["scores"].get("confidence", 3) for j in all_judge_scores]
+    averaged_scores["averageConfidence"] = round(sum(confidences) / len(confidences), 2)
+    
+    logger.info("[MULTI-JUDGE] Final scores from %d judges: %s", len(all_judge_scores), averaged_scores)
+    if high_disagreement_dims:
+        logger.warning("[CONSENSUS WARNING] High disagreement on: %s", high_disagreement_dims)
+
+    return {"scores": averaged_scores, "individualJudges": all_judge_scores}
+
+
+@app.route("/api/benchmark/evaluate", methods=["POST"])
+def evaluate_explanation():
+    """Evaluate an explanation using multiple LLM judges."""
+    try:
+        data = request.get_json()
+        result = run_judge_evaluation(
+            data.get("explanation", ""),
+            data.get("testCase", {}),
+            data.get("targetAudience", "developer"),
+            use_cache=request.args.get("nocache") != "1"
+        )
+
+        if result is None:
+            return jsonify({"error": "All judge models failed"}), 500
+
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error("[MULTI-JUDGE] Error: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+# Test cases evaluated concurrently by /api/benchmark/evaluate-batch; keep this
+# modest since every case fans out to all judge models (TPM limits)
+EVALUATE_BATCH_WORKERS = 8
+_evaluate_batch_pool = ThreadPoolExecutor(max_workers=EVALUATE_BATCH_WORKERS)
+# Each case holds a pool worker for four judge calls; larger sets belong in
+# /api/benchmark/batch-jobs
+EVALUATE_BATCH_MAX_CASES = 20
+
+
+@app.route("/api/benchmark/evaluate-batch", methods=["POST"])
+def evaluate_explanation_batch():
+    """Evaluate several explanations concurrently.
+
+    Expects {"cases": [{"explanation", "testCase", "targetAudience"?}, ...]} and
+    returns one result per case, in submission order.
+    """
+    try:
+        data = request.get_json()
+        cases = data.get("cases", [])
+        default_audience = data.get("targetAudience", "developer")
+        # Read here: the request context is not available in the pool threads
+        use_cache = request.args.get("nocache") != "1"
+
+        if not cases:
+            return jsonify({"error": "No cases provided"}), 400
+
+        if len(cases) > EVALUATE_BATCH_MAX_CASES:
+            return jsonify({"error": f"At most {EVALUATE_BATCH_MAX_CASES} cases per batch"}), 400
+
+        def evaluate_case(case):
             try:
+                result = run_judge_evaluation(
+                    case.get("explanation", ""),
+                    case.get("testCase", {}),
+                    case.get("targetAudience", default_audience),
+                    use_cache=use_cache
+                )
+            except Exception as case_err:
+                return {"error": str(case_err)}
+            return result if result is not None else {"error": "All judge models failed"}
+
+        results = list(_evaluate_batch_pool.map(evaluate_case, cases))
+
+        return jsonify({"results": results, "count": len(results)})
+
+    except Exception as e:
+        logger.error("[MULTI-JUDGE] Batch error: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+# Azure OpenAI Batch API jobs for offline scoring: cheaper per token, but
+# results arrive within the completion window rather than interactively. Each
+# judge's deployment must support batch (Global Batch deployment type).
+JUDGE_BATCH_COMPLETION_WINDOW = "24h"
+JUDGE_BATCH_MAX_CASES = 1000
+_BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# Job ids carry one character per case (its audience's index here), so a
+# 1000-case id stays well inside gunicorn's 4094-byte request line limit
+_AUDIENCE_CODES = list(AUDIENCE_WEIGHTS)
+
+
+def _batch_job_signature(payload):
+    """HMAC of an encoded job payload, keyed by the app secret.
+
+    Ids only verify on workers sharing the key, so set FLASK_SECRET_KEY when
+    running more than one process.
+    """
+    key = app.secret_key if isinstance(app.secret_key, bytes) else app.secret_key.encode()
+    digest = hmac.new(key, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def _encode_batch_job(job):
+    """Pack job state into a signed id so any worker can poll it (no server-side store)."""
+    payload = base64.urlsafe_b64encode(orjson.dumps(job)).decode().rstrip("=")
+    return f"{payload}.{_batch_job_signature(payload)}"
+
+
+def _decode_batch_job(job_id):
+    """Inverse of `_encode_batch_job`; raises ValueError on a malformed or forged id."""
+    payload, _, signature = job_id.partition(".")
+    if not hmac.compare_digest(signature, _batch_job_signature(payload)):
+        raise ValueError("Invalid job id: bad signature")
+    try:
+        job = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except Exception as e:
+        raise ValueError(f"Invalid job id: {e}") from e
+    # The count sizes the result list, so it must agree with the job's own data
+    count, audiences = job.get("count"), job.get("audiences")
+    if (not isinstance(count, int) or not 0 < count <= JUDGE_BATCH_MAX_CASES
+            or not isinstance(audiences, str) or len(audiences) != count
+            or not isinstance(job.get("batches"), dict)):
+        raise ValueError("Invalid job id: inconsistent job data")
+    try:
+        job["audiences"] = [_AUDIENCE_CODES[int(code)] for code in audiences]
+    except (ValueError, IndexError) as e:
+        raise ValueError("Invalid job id: unknown audience") from e
+    return job
+
+
+def _cancel_batches(batches):
+    """Best-effort cancel of already-submitted batches after a failed submission."""
+    for judge_model, batch_id in batches.items():
+        try:
+            openai_client, _ = get_openai_client(judge_model)
+            openai_client.batches.cancel(batch_id)
+            logger.info("[BATCH] Cancelled %s batch %s", judge_model, batch_id)
+        except Exception as cancel_err:
+            logger.error("[BATCH] Could not cancel %s batch %s: %s", judge_model, batch_id, cancel_err)
+
+
+@app.route("/api/benchmark/batch-jobs", methods=["POST"])
+def submit_judge_batch_job():
+    """Submit evaluations to the Azure OpenAI Batch API, one batch per judge model.
+
+    Expects the same body as /api/benchmark/evaluate-batch and returns a job id
+    to poll with GET /api/benchmark/batch-jobs/<job_id>.
+    """
+    try:
+        data = request.get_json()
+        cases = data.get("cases", [])
+        default_audience = data.get("targetAudience", "developer")
+
+        if not cases:
+            return jsonify({"error": "No cases provided"}), 400
+
+        if len(cases) > JUDGE_BATCH_MAX_CASES:
+            return jsonify({"error": f"At most {JUDGE_BATCH_MAX_CASES} cases per batch job"}), 400
+
+        audiences = [normalize_audience(case.get("targetAudience", default_audience)) for case in cases]
+        prompts = [
+            judge_evaluation_prompt(case.get("explanation", ""), case.get("testCase", {}), audience)
+            for case, audience in zip(cases, audiences)
+        ]
+
+        # A batch input file may only target one deployment, so each judge gets its own
+        batches = {}
+        try:
+            for judge_model in JUDGE_MODELS:
                 openai_client, deployment = get_openai_client(judge_model)
                 if not openai_client:
-                    print(f"[MULTI-JUDGE] Skipping {judge_model}: not configured")
                     continue
+                lines = b"\n".join(
+                    orjson.dumps({
+                        "custom_id": str(i),
+                        "method": "POST",
+                        "url": "/chat/completions",
+                        "body": {"model": deployment, **_judge_request(judge_model, prompt)}
+                    })
+                    for i, prompt in enumerate(prompts)
+                )
+                input_file = openai_client.files.create(file=("judges.jsonl", lines), purpose="batch")
+                batch = openai_client.batches.create(
+                    input_file_id=input_file.id,
+                    endpoint="/chat/completions",
+                    completion_window=JUDGE_BATCH_COMPLETION_WINDOW
+                )
+                batches[judge_model] = batch.id
+                logger.info("[BATCH] Submitted %d cases to %s as %s", len(prompts), judge_model, batch.id)
+        except Exception:
+            # The caller never gets a job id, so don't leave earlier batches billing
+            _cancel_batches(batches)
+            raise
 
-                print(f"[MULTI-JUDGE] Getting evaluation from {judge_model}...")
-                
-                # Retry logic for empty responses
-                max_retries = 3
-                response_text = None
-                
-                for attempt in range(max_retries):
-                    # Handle different model API requirements
-                    if judge_model.startswith("o"):
-                        # O-series models: no system message, no temperature, use max_completion_tokens
-                        combined_prompt = f"You are an expert evaluator. Respond only with valid JSON. No markdown code blocks.\n\n{evaluation_prompt}"
-                        response = openai_client.chat.completions.create(
-                            model=deployment,
-                            messages=[
-                                {"role": "user", "content": combined_prompt}
-                            ],
-                            max_completion_tokens=1500
-                        )
-                    elif judge_model in ["gpt-5.2-chat"]:
-                        # GPT-5.2: uses max_completion_tokens
-                        response = openai_client.chat.completions.create(
-                            model=deployment,
-                            messages=[
-                                {"role": "system", "content": "You are an expert evaluator. Respond only with valid JSON."},
-                                {"role": "user", "content": evaluation_prompt}
-                            ],
-                            max_completion_tokens=800
-                        )
-                    else:
-                        # Standard models: max_tokens + temperature
-                        response = openai_client.chat.completions.create(
-                            model=deployment,
-                            messages=[
-                                {"role": "system", "content": "You are an expert evaluator. Respond only with valid JSON."},
-                                {"role": "user", "content": evaluation_prompt}
-                            ],
-                            max_tokens=800,
-                            temperature=0.3
-                        )
-
-                    response_text = response.choices[0].message.content
-                    if response_text:
-                        break
-                    print(f"[MULTI-JUDGE] {judge_model} returned empty response (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(1)  # Brief pause before retry
-                
-                if not response_text:
-                    print(f"[MULTI-JUDGE] {judge_model} failed after {max_retries} retries")
-                    continue
-                    
-                response_text = response_text.strip()
-                print(f"[MULTI-JUDGE] {judge_model} raw response: {response_text[:300]}")
-                
-                # Parse JSON response
-                if response_text.startswith('```'):
-                    response_text = response_text.split('```')[1]
-                    if response_text.startswith('json'):
-                        response_text = response_text[4:]
-                
-                judge_scores = json.loads(response_text)
-                all_judge_scores.append({
-                    "model": judge_model,
-                    "scores": judge_scores
-                })
-                
-                if judge_scores.get("evaluatorNotes"):
-                    judge_notes.append(f"**{AI_MODELS[judge_model]['name']}**: {judge_scores['evaluatorNotes']}")
-                
-                print(f"[MULTI-JUDGE] {judge_model} scores parsed successfully")
-                
-            except Exception as judge_err:
-                print(f"[MULTI-JUDGE] Error from {judge_model}: {str(judge_err)}")
-                continue
+        if not batches:
+            return jsonify({"error": "No judge models configured"}), 500
 
-        # If no judges succeeded, return error
-        if not all_judge_scores:
-            return jsonify({"error": "All judge models failed"}), 500
+        return jsonify({
+            "jobId": _encode_batch_job({
+                "count": len(prompts),
+                "audiences": "".join(str(_AUDIENCE_CODES.index(audience)) for audience in audiences),
+                "batches": batches
+            }),
+            "count": len(prompts),
+            "judges": list(batches)
+        }), 202
 
-        # Calculate statistics and normalized scores
-        dimensions = ["faithfulness", "structure", "clarity", "analysisDepth", "contextAccuracy", "actionability", "conciseness"]
-        
-        # Calculate raw averages and statistics
-        raw_averaged_scores = {}
-        score_statistics = {}
-        
-        for dim in dimensions:
-            dim_scores = [j["scores"].get(dim, 3) for j in all_judge_scores]
-            raw_averaged_scores[dim] = sum(dim_scores) / len(dim_scores)
-            
-            # Calculate statistics for consensus checking
-            import statistics
-            score_statistics[dim] = {
-                "mean": raw_averaged_scores[dim],
-                "std": statistics.stdev(dim_scores) if len(dim_scores) > 1 else 0,
-                "min": min(dim_scores),
-                "max": max(dim_scores),
-                "range": max(dim_scores) - min(dim_scores)
-            }
-        
-        # Check for consensus issues (high disagreement)
-        high_disagreement_dims = [
-            dim for dim, stats in score_statistics.items() 
-            if stats["std"] > 1.0 or stats["range"] > 2
-        ]
-        
-        # Normalize scores (optional z-score normalization per judge)
-        normalized_scores = normalize_judge_scores(all_judge_scores, dimensions)
-        
-        # Final averaged scores (using normalized if available, otherwise raw)
-        averaged_scores = {}
-        for dim in dimensions:
-            if normalized_scores:
-                averaged_scores[dim] = round(normalized_scores[dim], 2)
-            else:
-                averaged_scores[dim] = round(raw_averaged_scores[dim], 2)
-        
-        # Add metadata
-        averaged_scores["evaluatorNotes"] = "\n\n".join(judge_notes) if judge_notes else "No detailed notes available"
-        averaged_scores["judgeCount"] = len(all_judge_scores)
-        averaged_scores["judges"] = [j["model"] for j in all_judge_scores]
-        averaged_scores["consensus"] = {
-            "highDisagreement": high_disagreement_dims,
-            "statistics": score_statistics
-        }
-        
-        # Calculate average confidence if available
-        confidences = [j["scores"].get("confidence", 3) for j in all_judge_scores]
-        averaged_scores["averageConfidence"] = round(sum(confidences) / len(confidences), 2)
-        
-        print(f"[MULTI-JUDGE] Final scores from {len(all_judge_scores)} judges: {averaged_scores}")
-        if high_disagreement_dims:
-            print(f"[CONSENSUS WARNING] High disagreement on: {high_disagreement_dims}")
+    except Exception as e:
+        logger.error("[BATCH] Submit error: %s", e)
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify({"scores": averaged_scores, "individualJudges": all_judge_scores})
+
+@app.route("/api/benchmark/batch-jobs/<job_id>")
+def get_judge_batch_job(job_id):
+    """Poll a judge batch job; once every batch is finished, aggregate the scores.
+
+    Returns {"status": "in_progress", "batches"} while any batch is running, then
+    {"status": "completed", "batches", "results", "count"} with one result per case.
+    """
+    try:
+        job = _decode_batch_job(job_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        count = job["count"]
+        batch_info = {}
+        finished = {}
+        for judge_model, batch_id in job["batches"].items():
+            openai_client, _ = get_openai_client(judge_model)
+            if not openai_client:
+                batch_info[judge_model] = "not_configured"
+                continue
+            batch = openai_client.batches.retrieve(batch_id)
+            batch_info[judge_model] = batch.status
+            if batch.status in _BATCH_TERMINAL_STATUSES:
+                finished[judge_model] = (openai_client, batch)
+
+        if any(status not in _BATCH_TERMINAL_STATUSES and status != "not_configured"
+               for status in batch_info.values()):
+            return jsonify({"status": "in_progress", "batches": batch_info})
+
+        # scores_by_case[i][judge_model] -> parsed judge scores (count is bounded
+        # by _decode_batch_job)
+        scores_by_case = [{} for _ in range(count)]
+        for judge_model, (openai_client, batch) in finished.items():
+            if not batch.output_file_id:
+                continue
+            output = openai_client.files.content(batch.output_file_id).text
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    item = orjson.loads(line)
+                    body = (item.get("response") or {}).get("body") or {}
+                    content = body["choices"][0]["message"]["content"]
+                    case_index = int(item["custom_id"])
+                    if not 0 <= case_index < count:
+                        raise ValueError(f"custom_id {case_index} out of range")
+                    scores_by_case[case_index][judge_model] = _parse_judge_reply(content)
+                except Exception as line_err:
+                    logger.warning("[BATCH] Unusable %s result line: %s", judge_model, line_err)
+
+        audiences = job["audiences"]
+        results = []
+        for case_scores, audience in zip(scores_by_case, audiences):
+            # Keep the same judge order as the synchronous path
+            result = aggregate_judge_scores([
+                {"model": judge_model, "scores": case_scores[judge_model]}
+                for judge_model in JUDGE_MODELS
+                if judge_model in case_scores
+            ], audience)
+            results.append(result if result is not None else {"error": "All judge models failed"})
+
+        return jsonify({"status": "completed", "batches": batch_info, "results": results, "count": count})
 
     except Exception as e:
-        print(f"[MULTI-JUDGE] Error: {str(e)}")
+        logger.error("[BATCH] Poll error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+# Explanation prompt. Invariant text comes first and is kept byte-stable, with
+# the query and results last. Azure OpenAI only caches prefixes of 1024+ tokens,
+# so this is laid out for caching but too short to be cached today.
+EXPLAIN_SYSTEM_PROMPT = "You are an expert in Azure Log Analytics, KQL (Kusto Query Language), and Azure monitoring. Provide clear, actionable explanations."
+_EXPLAIN_SYSTEM_MESSAGE = {"role": "system", "content": EXPLAIN_SYSTEM_PROMPT}
+
+EXPLAIN_INSTRUCTIONS = """You are an Azure Log Analytics expert. Analyze the KQL query and its results given below, then provide a clear, helpful explanation.
+
+## Instructions:
+1. **Query Explanation**: Briefly explain what this KQL query does in plain language.
+2. **Results Analysis**: Describe what the results show - patterns, notable values, or insights.
+3. **Table/Column Context**: If you recognize standard Azure tables (like Heartbeat, AzureActivity, requests, exceptions, traces, etc.), explain what these tables typically contain and what the columns mean.
+4. **Insights**: Highlight any interesting findings, potential issues, or recommendations based on the data.
+
+Keep the explanation concise but informative. Use bullet points for clarity. If the results are empty, explain possible reasons why."""
+
+
+# Limits on the results summary sent with the explanation prompt
+EXPLAIN_SAMPLE_ROWS = 5
+EXPLAIN_MAX_COLUMNS = 30
+EXPLAIN_MAX_CELL_CHARS = 200
+EXPLAIN_MAX_TABLES_CHARS = 4000
+EXPLAIN_MAX_QUERY_CHARS = 4000
+
+
+def _truncate_cell(value, n=EXPLAIN_MAX_CELL_CHARS):
+    """Clip a sample cell so a single wide value (stack trace, raw message) can't bloat the prompt."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else str(value)
+    return text[:n] + "..." if len(text) > n else text
+
+
+def _sample_row(row):
+    """Bound one sample row to EXPLAIN_MAX_COLUMNS clipped cells (list or dict rows)."""
+    if isinstance(row, list):
+        return [_truncate_cell(v) for v in row[:EXPLAIN_MAX_COLUMNS]]
+    if isinstance(row, dict):
+        return {k: _truncate_cell(v) for k, v in list(row.items())[:EXPLAIN_MAX_COLUMNS]}
+    return _truncate_cell(row)
+
+
+def build_explain_prompt(query, tables, total_rows):
+    """Build the explanation prompt from the query and a bounded summary of its results."""
+    # Prepare a bounded summary of results for the AI
+    results_summary = []
+    for table in tables:
+        columns = table.get("columns", [])
+        table_info = {
+            "name": table.get("name", "Unknown"),
+            "columns": columns[:EXPLAIN_MAX_COLUMNS],
+            "row_count": table.get("row_count", 0),
+            "sample_rows": [_sample_row(row) for row in table.get("rows", [])[:EXPLAIN_SAMPLE_ROWS]]
+        }
+        if len(columns) > EXPLAIN_MAX_COLUMNS:
+            table_info["omitted_columns"] = len(columns) - EXPLAIN_MAX_COLUMNS
+        results_summary.append(table_info)
+
+    # Compact JSON: the model reads it just as well and indentation only costs tokens
+    tables_json = orjson.dumps(results_summary, default=str).decode()
+    if len(tables_json) > EXPLAIN_MAX_TABLES_CHARS:
+        tables_json = tables_json[:EXPLAIN_MAX_TABLES_CHARS] + "... [truncated]"
+    if len(query) > EXPLAIN_MAX_QUERY_CHARS:
+        query = query[:EXPLAIN_MAX_QUERY_CHARS] + "\n// ... [truncated]"
+
+    return f"""{EXPLAIN_INSTRUCTIONS}
+
+## KQL Query:
+```kql
+{query}
+```
+
+## Results Summary:
+- Total rows returned: {total_rows}
+- Tables: {tables_json}"""
+
+
+def explain_messages(model_id, prompt):
+    """Shape the explanation messages for a model (system message where supported)."""
+    if AI_MODELS[model_id]["supports_system"]:
+        return [
+            _EXPLAIN_SYSTEM_MESSAGE,
+            {"role": "user", "content": prompt}
+        ]
+    # Combine system prompt into user message (o-series models)
+    return [{"role": "user", "content": f"{EXPLAIN_SYSTEM_PROMPT}\n\n{prompt}"}]
+
+
+# Explanations keyed by (model_id, prompt digest); pass ?nocache=1 to bypass
+EXPLAIN_CACHE_TTL_SECONDS = 3600
+_explain_cache = TTLCache(maxsize=1000, ttl=EXPLAIN_CACHE_TTL_SECONDS)
+_explain_cache_lock = threading.Lock()
+
+
+def _explain_cache_key(model_id, prompt):
+    """Key an explanation by model and a digest of its full prompt."""
+    return (model_id, hashlib.blake2b(prompt.encode(), digest_size=16).digest())
+
+
 @app.route("/api/explain", methods=["POST"])
 def explain_results():
     """Generate an AI explanation of query results."""
-    import time
     start_time = time.time()
     
     try:
@@ -606,7 +1445,7 @@ def explain_results():
         total_rows = data.get("total_rows", 0)
         model_id = data.get("model", DEFAULT_MODEL)
         
-        print(f"[EXPLAIN] Starting explanation with model={model_id}, total_rows={total_rows}")
+        logger.info("[EXPLAIN] Starting explanation with model=%s, total_rows=%s", model_id, total_rows)
 
         # Get the appropriate client for the selected model
         openai_client, deployment = get_openai_client(model_id)
@@ -614,93 +1453,294 @@ def explain_results():
         if not openai_client:
             return jsonify({"error": f"Model '{model_id}' not configured"}), 500
 
-        print(f"[EXPLAIN] Client ready, preparing prompt... ({time.time() - start_time:.2f}s)")
+        logger.debug("[EXPLAIN] Client ready, preparing prompt... (%.2fs)", time.time() - start_time)
+
+        prompt = build_explain_prompt(query, tables, total_rows)
+
+        # Identical prompts to the same model reuse the earlier explanation
+        cache_key = _explain_cache_key(model_id, prompt)
+        if request.args.get("nocache") != "1":
+            with _explain_cache_lock:
+                cached_explanation = _explain_cache.get(cache_key)
+            if cached_explanation is not None:
+                logger.debug("[EXPLAIN] Cache hit, returning stored explanation (%.2fs)", time.time() - start_time)
+                return jsonify({
+                    "success": True,
+                    "explanation": cached_explanation,
+                    "model": model_id,
+                    "cached": True
+                })
 
-        # Prepare a summary of results for the AI
-        results_summary = []
-        for table in tables:
-            table_info = {
-                "name": table.get("name", "Unknown"),
-                "columns": table.get("columns", []),
-                "row_count": table.get("row_count", 0),
-                "sample_rows": table.get("rows", [])[:5]  # First 5 rows as sample
-            }
-            results_summary.append(table_info)
+        logger.debug("[EXPLAIN] Prompt ready, calling %s API... (%.2fs)", model_id, time.time() - start_time)
+        response = openai_client.chat.completions.create(
+            model=deployment,
+            messages=explain_messages(model_id, prompt),
+            **AI_MODELS[model_id]["explain_kwargs"]
+        )
 
-        prompt = f"""You are an Azure Log Analytics expert. Analyze the following KQL query and its results, then provide a clear, helpful explanation.
+        explanation = response.choices[0].message.content
+        if explanation:
+            with _explain_cache_lock:
+                _explain_cache[cache_key] = explanation
+        
+        logger.info("[EXPLAIN] Complete! Total time: %.2fs", time.time() - start_time)
 
-## KQL Query:
-```kql
-{query}
-```
+        return jsonify({
+            "success": True,
+            "explanation": explanation,
+            "model": model_id
+        })
 
-## Results Summary:
-- Total rows returned: {total_rows}
-- Tables: {json.dumps(results_summary, indent=2, default=str)}
+    except Exception as e:
+        logger.error("[EXPLAIN] Error after %.2fs: %s", time.time() - start_time, e)
+        return jsonify({"error": str(e)}), 500
 
-## Instructions:
-1. **Query Explanation**: Briefly explain what this KQL query does in plain language.
-2. **Results Analysis**: Describe what the results show - patterns, notable values, or insights.
-3. **Table/Column Context**: If you recognize standard Azure tables (like Heartbeat, AzureActivity, requests, exceptions, traces, etc.), explain what these tables typically contain and what the columns mean.
-4. **Insights**: Highlight any interesting findings, potential issues, or recommendations based on the data.
 
-Keep the explanation concise but informative. Use bullet points for clarity. If the results are empty, explain possible reasons why."""
+def _sse(payload, event=None):
+    """Format one Server-Sent Events message with a JSON payload."""
+    head = f"event: {event}\n".encode() if event else b""
+    return head + b"data: " + orjson.dumps(payload) + b"\n\n"
 
-        print(f"[EXPLAIN] Prompt ready, calling API... ({time.time() - start_time:.2f}s)")
 
-        # O-series models (o4-mini, o1, etc.) don't support system messages or temperature
-        if model_id.startswith("o"):
-            # Combine system prompt into user message for o-series models
-            combined_prompt = f"""You are an expert in Azure Log Analytics, KQL (Kusto Query Language), and Azure monitoring. Provide clear, actionable explanations.
+@app.route("/api/explain-stream", methods=["POST"])
+def explain_results_stream():
+    """Stream an AI explanation as Server-Sent Events while it is generated.
 
-{prompt}"""
-            try:
-                print(f"[EXPLAIN] Calling O-series model {model_id}... (this may take longer)")
-                response = openai_client.chat.completions.create(
-                    model=deployment,
-                    messages=[
-                        {"role": "user", "content": combined_prompt}
-                    ],
-                    max_completion_tokens=4000
-                )
-            except Exception as o_err:
-                print(f"[O-SERIES ERROR] {model_id}: {str(o_err)}")
-                raise
-        # Use max_completion_tokens for newer chat models (gpt-5.2, etc.)
-        elif model_id in ["gpt-5.2-chat"]:
-            print(f"[EXPLAIN] Calling GPT-5.2 API... ({time.time() - start_time:.2f}s)")
-            response = openai_client.chat.completions.create(
-                model=deployment,
-                messages=[
-                    {"role": "system", "content": "You are an expert in Azure Log Analytics, KQL (Kusto Query Language), and Azure monitoring. Provide clear, actionable explanations."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_completion_tokens=1000
-            )
-        else:
-            print(f"[EXPLAIN] Calling {model_id} API... ({time.time() - start_time:.2f}s)")
-            response = openai_client.chat.completions.create(
+    Takes the same body as /api/explain. Emits `data: {"delta": ...}` messages,
+    then `event: done` with {"model", "cached"}; failures arrive as `event: error`.
+    """
+    try:
+        data = request.get_json()
+        model_id = data.get("model", DEFAULT_MODEL)
+
+        openai_client, deployment = get_openai_client(model_id)
+        if not openai_client:
+            return jsonify({"error": f"Model '{model_id}' not configured"}), 500
+
+        prompt = build_explain_prompt(data.get("query", ""), data.get("tables", []), data.get("total_rows", 0))
+        cache_key = _explain_cache_key(model_id, prompt)
+        cached_explanation = None
+        if request.args.get("nocache") != "1":
+            with _explain_cache_lock:
+                cached_explanation = _explain_cache.get(cache_key)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        if cached_explanation is not None:
+            yield _sse({"delta": cached_explanation})
+            yield _sse({"model": model_id, "cached": True}, event="done")
+            return
+
+        parts = []
+        try:
+            stream = openai_client.chat.completions.create(
                 model=deployment,
-                messages=[
-                    {"role": "system", "content": "You are an expert in Azure Log Analytics, KQL (Kusto Query Language), and Azure monitoring. Provide clear, actionable explanations."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.7
+                messages=explain_messages(model_id, prompt),
+                stream=True,
+                **AI_MODELS[model_id]["explain_kwargs"]
             )
+            for chunk in stream:
+                # Azure sends content-filter chunks with no choices
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield _sse({"delta": delta})
+        except Exception as e:
+            logger.error("[EXPLAIN] Stream error: %s", e)
+            yield _sse({"error": str(e)}, event="error")
+            return
+
+        explanation = "".join(parts)
+        if explanation:
+            with _explain_cache_lock:
+                _explain_cache[cache_key] = explanation
+        yield _sse({"model": model_id, "cached": False}, event="done")
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop reverse proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def generate_explanation(model_id, query, tables, total_rows, use_cache=True):
+    """Explain query results with one model, sharing /api/explain's cache.
+
+    Raises ValueError if the model is not configured.
+    """
+    openai_client, deployment = get_openai_client(model_id)
+    if not openai_client:
+        raise ValueError(f"Model '{model_id}' not configured")
+
+    prompt = build_explain_prompt(query, tables, total_rows)
+    cache_key = _explain_cache_key(model_id, prompt)
+    if use_cache:
+        with _explain_cache_lock:
+            cached_explanation = _explain_cache.get(cache_key)
+        if cached_explanation is not None:
+            return cached_explanation
+
+    response = openai_client.chat.completions.create(
+        model=deployment,
+        messages=explain_messages(model_id, prompt),
+        **AI_MODELS[model_id]["explain_kwargs"]
+    )
+    explanation = response.choices[0].message.content
+    if explanation:
+        with _explain_cache_lock:
+            _explain_cache[cache_key] = explanation
+    return explanation
+
+
+# (query, model) pairs scored concurrently by /api/benchmark/run; each pair is
+# one explanation call followed by a fan-out to every judge model
+BENCHMARK_RUN_WORKERS = 16
+_benchmark_run_pool = ThreadPoolExecutor(max_workers=BENCHMARK_RUN_WORKERS)
+# Upper bound on queries x models per request, so one run can't hold the
+# shared pools for long
+BENCHMARK_RUN_MAX_PAIRS = 50
+
+
+def _benchmark_tables(tables):
+    """Copy result tables with only the rows the explain and judge prompts sample, as lists."""
+    sample_rows = max(EXPLAIN_SAMPLE_ROWS, JUDGE_RESULT_ROWS)
+    return [
+        {
+            "name": table["name"],
+            "columns": table["columns"],
+            "rows": [row if isinstance(row, (list, dict)) else list(row) for row in table["rows"][:sample_rows]],
+            "row_count": table["row_count"]
+        }
+        for table in tables
+    ]
 
-        explanation = response.choices[0].message.content
-        
-        print(f"[EXPLAIN] Complete! Total time: {time.time() - start_time:.2f}s")
+
+def _score_benchmark_case(query, tables, total_rows, model_id, target_audience, use_cache=True):
+    """Explain one query's results with a model and judge the explanation."""
+    try:
+        explanation = generate_explanation(model_id, query, tables, total_rows, use_cache)
+        if not explanation:
+            return {"error": "Empty explanation"}
+
+        first_table = tables[0] if tables else {"columns": [], "rows": []}
+        test_case = {"query": query, "results": {"columns": first_table["columns"], "rows": first_table["rows"]}}
+        evaluation = run_judge_evaluation(explanation, test_case, target_audience, use_cache)
+    except Exception as case_err:
+        return {"error": str(case_err)}
+
+    if evaluation is None:
+        return {"error": "All judge models failed"}
+    return {
+        "explanation": explanation,
+        "weightedScore": evaluation["scores"]["weightedScore"],
+        "scores": evaluation["scores"]
+    }
+
+
+@app.route("/api/benchmark/run", methods=["POST"])
+def run_benchmark():
+    """Run, explain and judge a set of queries against several models.
+
+    Accepts {"workspace_id", "queries": [{"name"?, "query"}, ...], "models"?,
+    "targetAudience"?, "timespan_hours"?}. Queries go to Log Analytics in
+    batches, then every (query, model) pair is explained and judged
+    concurrently. Returns {"success", "results": {"leaderboard", "perQuery"},
+    "queries"}, which /api/benchmark/export-excel accepts as-is.
+    """
+    try:
+        data = request.get_json()
+        workspace_id = data.get("workspace_id", "").strip()
+        queries = data.get("queries") or []
+        models = data.get("models") or [DEFAULT_MODEL]
+        target_audience = data.get("targetAudience", "developer")
+        timespan = timedelta(hours=int(data.get("timespan_hours", 1)))
+        use_cache = request.args.get("nocache") != "1"
+
+        if not workspace_id:
+            return jsonify({"error": "Workspace ID is required"}), 400
+
+        if not isinstance(queries, list) or not queries:
+            return jsonify({"error": "queries must be a non-empty list"}), 400
+
+        if not isinstance(models, list) or not all(isinstance(model_id, str) for model_id in models):
+            return jsonify({"error": "models must be a list of model ids"}), 400
+
+        unknown_models = [model_id for model_id in models if model_id not in CONFIGURED_MODELS]
+        if unknown_models:
+            return jsonify({"error": f"Unknown or unconfigured models: {', '.join(unknown_models)}"}), 400
+
+        if len(queries) * len(models) > BENCHMARK_RUN_MAX_PAIRS:
+            return jsonify({"error": f"At most {BENCHMARK_RUN_MAX_PAIRS} query/model pairs per run"}), 400
+
+        queries = [
+            {"name": item.get("name") or f"Query {i + 1}", "query": item.get("query", "").strip()}
+            for i, item in enumerate(queries)
+        ]
+        for i, item in enumerate(queries):
+            if not item["query"]:
+                return jsonify({"error": f"Query is required (query {i})"}), 400
+
+        agent = get_monitor_agent()
+        query_results = []
+        for start in range(0, len(queries), QUERY_BATCH_MAX):
+            query_results.extend(agent.query_log_analytics_batch([
+                {
+                    "workspace_id": workspace_id,
+                    "kql_query": _limit_query(item["query"], QUERY_MAX_ROWS),
+                    "timespan": timespan
+                }
+                for item in queries[start:start + QUERY_BATCH_MAX]
+            ]))
+
+        # Every (query, model) pair is independent: submit them all, then collect
+        per_query = []
+        futures = {}
+        for q_idx, (item, result) in enumerate(zip(queries, query_results)):
+            if "error" in result:
+                per_query.append({"error": str(result["error"]), "modelResults": {}})
+                continue
+            processed_tables, total_rows, truncated = _process_query_tables(result.get("tables", []), QUERY_MAX_ROWS)
+            tables = _benchmark_tables(processed_tables)
+            per_query.append({"totalRows": total_rows, "truncated": truncated, "modelResults": {}})
+            for model_id in models:
+                futures[(q_idx, model_id)] = _benchmark_run_pool.submit(
+                    _score_benchmark_case, item["query"], tables, total_rows, model_id, target_audience, use_cache
+                )
+
+        for (q_idx, model_id), future in futures.items():
+            per_query[q_idx]["modelResults"][model_id] = future.result()
+
+        leaderboard = []
+        for model_id in models:
+            scored = [
+                entry["modelResults"][model_id] for entry in per_query
+                if "scores" in entry["modelResults"].get(model_id, {})
+            ]
+            if not scored:
+                continue
+            leaderboard.append({
+                "model": model_id,
+                "modelName": AI_MODELS[model_id]["name"],
+                "weightedScore": round(sum(case["weightedScore"] for case in scored) / len(scored), 2),
+                "scores": {
+                    dim: round(sum(case["scores"].get(dim, 0) for case in scored) / len(scored), 2)
+                    for dim in DIMENSIONS
+                },
+                "queryCount": len(scored)
+            })
+        leaderboard.sort(key=lambda entry: entry["weightedScore"], reverse=True)
 
         return jsonify({
             "success": True,
-            "explanation": explanation,
-            "model": model_id
+            "results": {"leaderboard": leaderboard, "perQuery": per_query},
+            "queries": queries
         })
 
     except Exception as e:
-        print(f"[EXPLAIN] Error after {time.time() - start_time:.2f}s: {str(e)}")
+        logger.error("[BENCHMARK] Run error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -789,81 +1829,139 @@ KQL_EXAMPLES = {
     }
 }
 
+_EXAMPLES_JSON = _static_json(KQL_EXAMPLES)
+
 
 @app.route("/api/examples")
 def get_examples():
     """Return KQL example queries."""
-    return jsonify(KQL_EXAMPLES)
+    return _static_json_response(_EXAMPLES_JSON)
+
+_AUDIENCE_WEIGHTS_JSON = _static_json(AUDIENCE_WEIGHTS)
+
 
 @app.route("/api/audience-weights")
 def get_audience_weights():
     """Return audience-specific scoring weights."""
-    return jsonify(AUDIENCE_WEIGHTS)
+    return _static_json_response(_AUDIENCE_WEIGHTS_JSON)
 
 
-@app.route("/api/benchmark/upload-excel", methods=["POST"])
-def upload_excel():
-    """Parse an uploaded Excel file containing KQL queries."""
+# Recognized upload header names (lower-cased) and the column each one marks
+UPLOAD_HEADER_ROLES = {
+    "query": "query", "kql": "query", "queries": "query", "kql query": "query",
+    "name": "name", "title": "name", "query name": "name",
+    "description": "description", "desc": "description", "notes": "description",
+}
+
+
+# Larger uploads are rejected before they are parsed: up front from
+# Content-Length, or while reading a chunked body (per-request limit)
+UPLOAD_MAX_BYTES = 50 * 1024 * 1024
+
+# Parsed uploads keyed by a digest of the file, so re-uploading the same
+# workbook skips the unzip and XML parse
+UPLOAD_CACHE_TTL_SECONDS = 3600
+_upload_cache = TTLCache(maxsize=32, ttl=UPLOAD_CACHE_TTL_SECONDS)
+_upload_cache_lock = threading.Lock()
+
+
+def _stream_digest(stream, chunk_size=1 << 16):
+    """Hash a seekable binary stream in chunks and rewind it."""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.digest()
+
+
+def parse_query_workbook(stream):
+    """Extract [{"name", "query", "description"}, ...] from an uploaded workbook."""
+    from openpyxl import load_workbook
+
+    # Read-only mode streams rows from the XML instead of building every
+    # cell object; data_only returns cached formula results. The upload is
+    # read in place from werkzeug's spooled stream rather than copied.
+    wb = load_workbook(filename=stream, read_only=True, data_only=True)
     try:
-        from openpyxl import load_workbook
-        from io import BytesIO
-        
-        if 'file' not in request.files:
-            return jsonify({"error": "No file uploaded"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
-        
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            return jsonify({"error": "Please upload an Excel file (.xlsx or .xls)"}), 400
-        
-        # Load workbook
-        wb = load_workbook(filename=BytesIO(file.read()))
         ws = wb.active
-        
+
         queries = []
-        headers = [cell.value for cell in ws[1]] if ws[1] else []
-        
+        headers = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+
         # Find query column (look for 'query', 'kql', 'queries' in header)
         query_col = None
         name_col = None
         description_col = None
-        
+
         for i, header in enumerate(headers):
-            if header:
-                header_lower = str(header).lower()
-                if header_lower in ['query', 'kql', 'queries', 'kql query']:
-                    query_col = i
-                elif header_lower in ['name', 'title', 'query name']:
-                    name_col = i
-                elif header_lower in ['description', 'desc', 'notes']:
-                    description_col = i
-        
+            role = UPLOAD_HEADER_ROLES.get(str(header).strip().lower()) if header else None
+            if role == "query":
+                query_col = i
+            elif role == "name":
+                name_col = i
+            elif role == "description":
+                description_col = i
+
         # If no header found, assume first column is query
         if query_col is None:
             query_col = 0
             # Check if first row looks like a header
-            first_cell = ws.cell(row=1, column=1).value
+            first_cell = headers[0] if headers else None
             if first_cell and str(first_cell).lower() in ['query', 'kql', 'queries', 'name']:
                 start_row = 2
             else:
                 start_row = 1
         else:
             start_row = 2
-        
+
+        # Read-only rows are only padded to the sheet's declared <dimension>,
+        # which non-Excel writers often omit, so pad short rows here
+        width = max(col for col in (query_col, name_col, description_col) if col is not None) + 1
+
         # Extract queries
         for row in ws.iter_rows(min_row=start_row, values_only=True):
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
             if row[query_col] and str(row[query_col]).strip():
                 query_text = str(row[query_col]).strip()
                 query_name = str(row[name_col]).strip() if name_col is not None and row[name_col] else f"Query {len(queries) + 1}"
                 query_desc = str(row[description_col]).strip() if description_col is not None and row[description_col] else ""
-                
+
                 queries.append({
                     "name": query_name,
                     "query": query_text,
                     "description": query_desc
                 })
+    finally:
+        # Read-only workbooks keep the zip archive open until closed
+        wb.close()
+
+    return queries
+
+
+@app.route("/api/benchmark/upload-excel", methods=["POST"])
+def upload_excel():
+    """Parse an uploaded Excel file containing KQL queries."""
+    # Applies to this route only; werkzeug enforces it while the body is read
+    request.max_content_length = UPLOAD_MAX_BYTES
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file uploaded"}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "No file selected"}), 400
+        
+        if not file.filename.endswith(('.xlsx', '.xls')):
+            return jsonify({"error": "Please upload an Excel file (.xlsx or .xls)"}), 400
+        
+        cache_key = _stream_digest(file.stream)
+        with _upload_cache_lock:
+            queries = _upload_cache.get(cache_key)
+        if queries is None:
+            queries = parse_query_workbook(file.stream)
+            with _upload_cache_lock:
+                _upload_cache[cache_key] = queries
         
         if not queries:
             return jsonify({"error": "No queries found in the Excel file. Make sure queries are in a column labeled 'Query' or 'KQL'."}), 400
@@ -874,6 +1972,8 @@ def upload_excel():
             "count": len(queries)
         })
         
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"File exceeds the {UPLOAD_MAX_BYTES // (1024 * 1024)} MB upload limit"}), 413
     except Exception as e:
         return jsonify({"error": f"Failed to parse Excel file: {str(e)}"}), 500
 
@@ -883,139 +1983,138 @@ def export_excel():
     """Export benchmark results to Excel file."""
     try:
         from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-        from io import BytesIO
-        from flask import send_file
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+        from openpyxl.styles.fonts import DEFAULT_FONT
         
         data = request.json
         results = data.get('results', {})
         queries = data.get('queries', [])
         
-        wb = Workbook()
+        # Write-only mode streams rows out as they are appended instead of
+        # keeping every cell in memory. Styles therefore go on WriteOnlyCells
+        # built up front, and column widths must be set before the first row.
+        wb = Workbook(write_only=True)
         
-        # Summary Sheet
-        ws_summary = wb.active
-        ws_summary.title = "Summary"
-        
-        # Styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        winner_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+        # Styles, registered once as named styles that cells reference by name
         thin_border = Border(
             left=Side(style='thin'),
             right=Side(style='thin'),
             top=Side(style='thin'),
             bottom=Side(style='thin')
         )
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        winner_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+        header_style = NamedStyle(name="Benchmark Header", font=header_font, fill=header_fill, border=thin_border)
+        centered_header_style = NamedStyle(
+            name="Benchmark Header Centered", font=header_font, fill=header_fill, border=thin_border,
+            alignment=Alignment(horizontal='center')
+        )
+        # Data cells keep the workbook's default font (a NamedStyle otherwise starts from a bare Font)
+        cell_style = NamedStyle(name="Benchmark Cell", font=DEFAULT_FONT, border=thin_border)
+        winner_style = NamedStyle(name="Benchmark Winner", font=DEFAULT_FONT, fill=winner_fill, border=thin_border)
+        for named_style in (header_style, centered_header_style, cell_style, winner_style):
+            wb.add_named_style(named_style)
+        
+        def styled_row(ws, values, style):
+            """Wrap row values in WriteOnlyCells using the given named style."""
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = style.name
+                cells.append(cell)
+            return cells
+        
+        # Summary Sheet
+        ws_summary = wb.create_sheet("Summary")
         
-        # Summary headers
+        # Auto-width columns
+        for letter in "ABCDEFGHI":
+            ws_summary.column_dimensions[letter].width = 15
+        
+        # Summary headers (score columns follow DIMENSIONS order)
         summary_headers = ["Model", "Weighted Score", "Faithfulness", "Structure", "Clarity", 
                          "Analysis Depth", "Context Accuracy", "Actionability", "Conciseness"]
-        for col, header in enumerate(summary_headers, 1):
-            cell = ws_summary.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
-            cell.alignment = Alignment(horizontal='center')
+        ws_summary.append(styled_row(ws_summary, summary_headers, centered_header_style))
         
         # Summary data
         leaderboard = results.get('leaderboard', [])
         for row_idx, model_data in enumerate(leaderboard, 2):
-            ws_summary.cell(row=row_idx, column=1, value=model_data.get('model', ''))
-            ws_summary.cell(row=row_idx, column=2, value=round(model_data.get('weightedScore', 0), 2))
-            ws_summary.cell(row=row_idx, column=3, value=round(model_data.get('scores', {}).get('faithfulness', 0), 2))
-            ws_summary.cell(row=row_idx, column=4, value=round(model_data.get('scores', {}).get('structure', 0), 2))
-            ws_summary.cell(row=row_idx, column=5, value=round(model_data.get('scores', {}).get('clarity', 0), 2))
-            ws_summary.cell(row=row_idx, column=6, value=round(model_data.get('scores', {}).get('analysisDepth', 0), 2))
-            ws_summary.cell(row=row_idx, column=7, value=round(model_data.get('scores', {}).get('contextAccuracy', 0), 2))
-            ws_summary.cell(row=row_idx, column=8, value=round(model_data.get('scores', {}).get('actionability', 0), 2))
-            ws_summary.cell(row=row_idx, column=9, value=round(model_data.get('scores', {}).get('conciseness', 0), 2))
-            
+            scores = model_data.get('scores') or {}
+            row = [
+                model_data.get('model', ''),
+                round(model_data.get('weightedScore', 0), 2),
+                *(round(scores.get(dim, 0), 2) for dim in DIMENSIONS)
+            ]
             # Highlight winner
             if row_idx == 2:
-                for col in range(1, 10):
-                    ws_summary.cell(row=row_idx, column=col).fill = winner_fill
-            
-            for col in range(1, 10):
-                ws_summary.cell(row=row_idx, column=col).border = thin_border
-        
-        # Auto-width columns
-        for col in range(1, 10):
-            ws_summary.column_dimensions[get_column_letter(col)].width = 15
+                ws_summary.append(styled_row(ws_summary, row, winner_style))
+            else:
+                ws_summary.append(styled_row(ws_summary, row, cell_style))
         
         # Per-Query Results Sheet
         ws_queries = wb.create_sheet("Per-Query Results")
         
+        # Auto-width
+        for letter in "ABCDEFGHIJK":
+            ws_queries.column_dimensions[letter].width = 15
+        ws_queries.column_dimensions['B'].width = 30
+        
         query_headers = ["Query #", "Query Name", "Model", "Weighted Score", 
                         "Faithfulness", "Structure", "Clarity", "Analysis Depth", 
                         "Context Accuracy", "Actionability", "Conciseness"]
-        for col, header in enumerate(query_headers, 1):
-            cell = ws_queries.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
+        ws_queries.append(styled_row(ws_queries, query_headers, header_style))
         
-        row_idx = 2
         per_query = results.get('perQuery', [])
         for q_idx, query_result in enumerate(per_query):
             query_name = queries[q_idx].get('name', f'Query {q_idx + 1}') if q_idx < len(queries) else f'Query {q_idx + 1}'
             for model, model_result in query_result.get('modelResults', {}).items():
-                scores = model_result.get('scores', {})
-                ws_queries.cell(row=row_idx, column=1, value=q_idx + 1)
-                ws_queries.cell(row=row_idx, column=2, value=query_name)
-                ws_queries.cell(row=row_idx, column=3, value=model)
-                ws_queries.cell(row=row_idx, column=4, value=round(model_result.get('weightedScore', 0), 2))
-                ws_queries.cell(row=row_idx, column=5, value=round(scores.get('faithfulness', 0), 2))
-                ws_queries.cell(row=row_idx, column=6, value=round(scores.get('structure', 0), 2))
-                ws_queries.cell(row=row_idx, column=7, value=round(scores.get('clarity', 0), 2))
-                ws_queries.cell(row=row_idx, column=8, value=round(scores.get('analysisDepth', 0), 2))
-                ws_queries.cell(row=row_idx, column=9, value=round(scores.get('contextAccuracy', 0), 2))
-                ws_queries.cell(row=row_idx, column=10, value=round(scores.get('actionability', 0), 2))
-                ws_queries.cell(row=row_idx, column=11, value=round(scores.get('conciseness', 0), 2))
-                
-                for col in range(1, 12):
-                    ws_queries.cell(row=row_idx, column=col).border = thin_border
-                row_idx += 1
-        
-        # Auto-width
-        for col in range(1, 12):
-            ws_queries.column_dimensions[get_column_letter(col)].width = 15
-        ws_queries.column_dimensions['B'].width = 30
+                scores = model_result.get('scores') or {}
+                ws_queries.append(styled_row(ws_queries, [
+                    q_idx + 1,
+                    query_name,
+                    model,
+                    round(model_result.get('weightedScore', 0), 2),
+                    *(round(scores.get(dim, 0), 2) for dim in DIMENSIONS)
+                ], cell_style))
         
         # Queries Sheet
         ws_query_list = wb.create_sheet("Queries")
-        query_list_headers = ["#", "Name", "Query"]
-        for col, header in enumerate(query_list_headers, 1):
-            cell = ws_query_list.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
-        
-        for q_idx, query in enumerate(queries, 2):
-            ws_query_list.cell(row=q_idx, column=1, value=q_idx - 1)
-            ws_query_list.cell(row=q_idx, column=2, value=query.get('name', ''))
-            ws_query_list.cell(row=q_idx, column=3, value=query.get('query', ''))
-        
         ws_query_list.column_dimensions['A'].width = 5
         ws_query_list.column_dimensions['B'].width = 30
         ws_query_list.column_dimensions['C'].width = 80
         
-        # Save to bytes
-        output = BytesIO()
-        wb.save(output)
+        query_list_headers = ["#", "Name", "Query"]
+        ws_query_list.append(styled_row(ws_query_list, query_list_headers, header_style))
+        
+        for q_idx, query in enumerate(queries, 1):
+            ws_query_list.append([q_idx, query.get('name', ''), query.get('query', '')])
+        
+        # Save to an anonymous temp file instead of an in-memory buffer; the
+        # response streams it from disk and closing it removes it
+        output = TemporaryFile()
+        try:
+            wb.save(output)
+        except Exception:
+            output.close()
+            raise
         output.seek(0)
         
-        return send_file(
+        response = send_file(
             output,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name='benchmark_results.xlsx'
         )
+        # send_file only sizes in-memory buffers; keep Content-Length for downloads
+        response.content_length = os.fstat(output.fileno()).st_size
+        return response
         
     except Exception as e:
         return jsonify({"error": f"Failed to export Excel: {str(e)}"}), 500
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    # Development server only; production runs under gunicorn (see wsgi.py)
+    app.run(debug=os.getenv("FLASK_DEBUG", "1") == "1", port=5000)
@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for serving wsgi:application.
+
+Picked up automatically when gunicorn is started from this directory:
+
+    gunicorn wsgi:application
+
+Override with GUNICORN_BIND, GUNICORN_WORKERS, GUNICORN_THREADS,
+GUNICORN_TIMEOUT and GUNICORN_PRELOAD, or with the usual command-line flags.
+"""
+
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Handlers block on network I/O that releases the GIL, so threads give the
+# concurrency; a few processes cover serialization of large query results.
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+
+# A benchmark evaluation waits on several judge models (with retries), which
+# can exceed gunicorn's 30s default and get the worker killed mid-request.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import the app once in the master so workers share the precomputed JSON
+# payloads and prompt constants via copy-on-write. Clients, thread pools and
+# caches are created lazily, so nothing with open sockets crosses the fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def post_worker_init(worker):
+    """Create the per-model OpenAI clients in each worker before it takes traffic."""
+    from app import warm_openai_clients
+    warm_openai_clients()
@@ -1,14 +1,31 @@
+import threading
 import time
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 try:  # Optional Azure SDK imports
     from azure.identity import DefaultAzureCredential  # type: ignore
-    from azure.monitor.query import LogsQueryClient  # type: ignore
+    from azure.monitor.query import LogsBatchQuery, LogsQueryClient  # type: ignore
 except Exception:  # pragma: no cover - optional during docs-only use
     DefaultAzureCredential = None  # type: ignore
+    LogsBatchQuery = None  # type: ignore
     LogsQueryClient = None  # type: ignore
 
 
+# Clients built with the default credential, keyed by endpoint (None for the
+# public cloud). Reusing them keeps the credential's token cache and the
+# client's HTTP connection pool alive across queries.
+_default_credential: Optional[Any] = None
+_default_clients: Dict[Optional[str], Any] = {}
+_default_clients_lock = threading.Lock()
+
+
+def _build_logs_client(credential: Any, endpoint: Optional[str]) -> Any:
+    """Construct a `LogsQueryClient` for `endpoint`, or the default endpoint if None."""
+    if endpoint:
+        return LogsQueryClient(endpoint, credential)  # type: ignore[arg-type]
+    return LogsQueryClient(credential)
+
+
 def get_logs_client(
     credential: Optional[Any] = None, endpoint: Optional[str] = None
 ) -> Optional[LogsQueryClient]:
@@ -17,17 +34,31 @@ def get_logs_client(
     This helper centralizes client creation so call-sites don't instantiate
     `LogsQueryClient` directly. If the Azure SDK isn't available this returns
     `None` and callers should fallback to their test/mocked behavior.
+
+    Without an explicit credential, one shared `DefaultAzureCredential` and
+    one client per endpoint are created on first use and reused afterwards.
     """
+    global _default_credential
+
     if LogsQueryClient is None:
         return None
     try:
-        if credential is None and DefaultAzureCredential is not None:
-            credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
-        if credential is None:
+        if credential is not None:
+            return _build_logs_client(credential, endpoint)
+        if DefaultAzureCredential is None:
             return None
-        if endpoint:
-            return LogsQueryClient(endpoint, credential)  # type: ignore[arg-type]
-        return LogsQueryClient(credential)
+
+        client = _default_clients.get(endpoint)
+        if client is not None:
+            return client
+        with _default_clients_lock:
+            client = _default_clients.get(endpoint)
+            if client is None:
+                if _default_credential is None:
+                    _default_credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
+                client = _build_logs_client(_default_credential, endpoint)
+                _default_clients[endpoint] = client
+            return client
     except Exception:
         return None
 
@@ -45,6 +76,8 @@ def execute_kql_query(
     Callers may pass an already-created `client` (preferred). If no client is
     provided, this will attempt to create one via `get_logs_client(credential)`.
     Returns a dict with keys: `tables`, `returned_rows_count`, `exec_stats`.
+    Each table is a dict with `name`, `columns`, `column_types` (Kusto type
+    names parallel to `columns`), `rows` (lists of cell values) and `row_count`.
     """
     start = time.time()
 
@@ -59,18 +92,7 @@ def execute_kql_query(
             resp = logs_client.query_workspace(
                 workspace_id=workspace_id, query=kql, timespan=timespan
             )
-            tables = []
-            if hasattr(resp, "tables") and resp.tables:
-                for i, table in enumerate(resp.tables):
-                    cols = [getattr(c, "name", str(c)) for c in getattr(table, "columns", [])]
-                    rows = [list(r) for r in getattr(table, "rows", [])]
-                    tables.append({"name": getattr(table, "name", f"table_{i}"), "columns": cols, "rows": rows, "row_count": len(rows)})
-            # Normalize status for cross-process compatibility
-            raw_status = getattr(resp, "status", None)
-            exec_stats = {"status": (raw_status.name if hasattr(raw_status, "name") else str(raw_status)) if raw_status is not None else "UNKNOWN", "raw_status": raw_status}
-            elapsed = time.time() - start
-            exec_stats["elapsed_sec"] = elapsed
-            return {"tables": tables, "returned_rows_count": sum(t.get("row_count", 0) for t in tables), "exec_stats": exec_stats}
+            return _normalize_response(resp, start)
         except Exception as e:
             elapsed = time.time() - start
             return {"tables": [], "returned_rows_count": 0, "exec_stats": {"error": str(e), "elapsed_sec": elapsed}}
@@ -85,42 +107,117 @@ def execute_kql_query(
         # Normalize status if present
         if "status" in exec_stats and exec_stats.get("status") is not None:
             s = exec_stats.get("status")
-            exec_stats["raw_status"] = s
+            exec_stats["raw_status"] = str(s)
             exec_stats["status"] = (s.name if hasattr(s, "name") else str(s)).upper()
         exec_stats["elapsed_sec"] = elapsed
-        return {"tables": result.get("tables", []), "returned_rows_count": len(result.get("tables", [])), "exec_stats": exec_stats}
+        tables = result.get("tables", [])
+        # Count rows, not tables; fallback tables may omit row_count
+        total_rows = sum(t.get("row_count", len(t.get("rows", []))) for t in tables)
+        return {"tables": tables, "returned_rows_count": total_rows, "exec_stats": exec_stats}
     except Exception:
         # Minimal simulated fallback
         elapsed = time.time() - start
         return {"tables": [], "returned_rows_count": 0, "exec_stats": {"simulated": True, "elapsed_sec": elapsed}}
 
 
+def execute_kql_batch(
+    queries: List[Dict[str, Any]],
+    client: Optional[Any] = None,
+    credential: Optional[Any] = None,
+    endpoint: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Execute several KQL queries in a single `query_batch` round trip.
+
+    Each item in `queries` is a dict with `kql`, `workspace_id` and optional
+    `timespan`, as accepted by `execute_kql_query`. Returns one result dict per
+    query, in order, shaped like `execute_kql_query`'s return value. Without an
+    SDK client the queries go through `execute_kql_query`'s fallback one by one.
+    """
+    start = time.time()
+
+    logs_client = client
+    if logs_client is None:
+        logs_client = get_logs_client(credential=credential, endpoint=endpoint)
+
+    if logs_client is None or LogsBatchQuery is None:
+        return [
+            execute_kql_query(q["kql"], q.get("workspace_id"), credential=credential, endpoint=endpoint, timespan=q.get("timespan"))
+            for q in queries
+        ]
+
+    try:
+        responses = logs_client.query_batch([
+            LogsBatchQuery(workspace_id=q.get("workspace_id"), query=q["kql"], timespan=q.get("timespan"))
+            for q in queries
+        ])
+    except Exception as e:
+        elapsed = time.time() - start
+        return [
+            {"tables": [], "returned_rows_count": 0, "exec_stats": {"error": str(e), "elapsed_sec": elapsed}}
+            for _ in queries
+        ]
+    return [_normalize_response(resp, start) for resp in responses]
+
+
+def _normalize_response(resp: Any, start: float) -> Dict[str, Any]:
+    """Convert one SDK query response (or batch entry) to the canonical result dict."""
+    tables = []
+    total_rows = 0
+    if hasattr(resp, "tables") and resp.tables:
+        for i, table in enumerate(resp.tables):
+            cols = column_names(getattr(table, "columns", []))
+            rows = [list(r) for r in getattr(table, "rows", [])]
+            row_count = len(rows)
+            total_rows += row_count
+            tables.append({"name": getattr(table, "name", f"table_{i}"), "columns": cols, "column_types": list(getattr(table, "columns_types", [])), "rows": rows, "row_count": row_count})
+    # Normalize status for cross-process compatibility
+    raw_status = getattr(resp, "status", None)
+    # Stringify the SDK enum once here so exec_stats stays JSON-serializable
+    exec_stats = {"status": (raw_status.name if hasattr(raw_status, "name") else str(raw_status)) if raw_status is not None else "UNKNOWN", "raw_status": str(raw_status) if raw_status is not None else None}
+    # Partial results carry partial_error; failed batch entries are LogsQueryError objects
+    error = getattr(resp, "partial_error", None) or getattr(resp, "message", None)
+    if error:
+        exec_stats["error"] = getattr(error, "message", None) or str(error)
+    exec_stats["elapsed_sec"] = time.time() - start
+    return {"tables": tables, "returned_rows_count": total_rows, "exec_stats": exec_stats}
+
+
+def column_names(columns: Any) -> List[str]:
+    """Column names from SDK column objects, {"name": ...} dicts or plain strings.
+
+    A table's columns all share one shape, so the first one picks the branch.
+    """
+    columns = list(columns)
+    first = columns[0] if columns else None
+    if isinstance(first, str):
+        # azure-monitor-query 2.x already returns names
+        return columns
+    if hasattr(first, "name"):
+        return [col.name for col in columns]
+    if isinstance(first, dict):
+        return [col["name"] for col in columns]
+    return [str(col) for col in columns]
+
+
 def normalize_status(status: Any) -> Optional[str]:
     """Normalize an SDK enum or string status to an upper-case string, or None."""
     if status is None:
         return None
-    try:
-        if hasattr(status, "name"):
-            return status.name.upper()
-    except Exception:
-        pass
-    try:
-        return str(status).upper()
-    except Exception:
-        return None
+    # SDK enums carry a name; plain strings don't, so no exception handling is needed
+    name = getattr(status, "name", None)
+    return (name if isinstance(name, str) else str(status)).upper()
 
 
 def is_success(status: Any) -> bool:
     """Return True if the provided status (enum or string) represents success."""
-    n = normalize_status(status)
-    return n == "SUCCESS"
+    return normalize_status(status) == "SUCCESS"
 
 
 # Compatibility note:
 # - `execute_kql_query` returns `exec_stats` where `exec_stats['status']` is a
 #   normalized upper-case string (e.g. "SUCCESS", "FAILURE", "UNKNOWN").
 # - When an SDK response is available we also include `exec_stats['raw_status']`
-#   containing the original SDK enum object. Callers that only need a simple
+#   containing the original SDK enum, already stringified. Callers that only need a simple
 #   success/failure check should use `is_success(exec_stats.get('status') or exec_stats.get('raw_status'))`.
 
 
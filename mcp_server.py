@@ -7,29 +7,165 @@ for querying Azure Log Analytics workspaces using KQL.
 """
 
 import asyncio
-import json
+import functools
 import logging
+import os
+import re
 from datetime import datetime, timedelta, timezone
-from typing import Any, Sequence
+from typing import Any, Optional
 
-from utils.kql_exec import get_logs_client, execute_kql_query, is_success
+import orjson
+from cachetools import TTLCache
 from mcp.server import NotificationOptions, Server
 from mcp.server.models import InitializationOptions
-from mcp.types import (EmbeddedResource, ImageContent, LoggingLevel, Resource,
-                       TextContent, Tool)
-from pydantic import AnyUrl
+from mcp.types import EmbeddedResource, ImageContent, TextContent, Tool
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("kql-mcp-server")
 
-client = get_logs_client()
-if client is None:
-    logger.warning("Azure Monitor SDK not available or credential not configured; MCP server will use fallback execution path")
-
 server = Server("kql-mcp-server")
 
 
+@functools.lru_cache(maxsize=None)
+def kql():
+    """Import utils.kql_exec (and the Azure SDK behind it) on first use.
+
+    Keeps server start-up and get_kql_examples free of the SDK import cost.
+    """
+    from utils import kql_exec
+    return kql_exec
+
+
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """Get the shared LogsQueryClient (None when the SDK is unavailable), creating it on first use."""
+    client = kql().get_logs_client()
+    if client is None:
+        logger.warning("Azure Monitor SDK not available or credential not configured; MCP server will use fallback execution path")
+    return client
+
+
+def _run_batch(requests: list) -> list:
+    """Execute a batch of KQL requests; runs in a worker thread."""
+    return kql().execute_kql_batch(requests, client=get_client())
+
+# Concurrent execute_kql_query calls arriving within this window are sent to
+# Log Analytics together as one query_batch request
+KQL_BATCH_WINDOW_SEC = 0.02
+# Log Analytics accepts at most 10 queries per batch request
+KQL_BATCH_MAX = 10
+# Upper bound on SDK requests in flight at once; each runs in a worker
+# thread so the event loop keeps serving other tool calls meanwhile
+KQL_MAX_IN_FLIGHT = int(os.getenv("KQL_MAX_CONCURRENCY", "8"))
+
+_query_slots = asyncio.Semaphore(KQL_MAX_IN_FLIGHT)
+
+# Successful results keyed by (workspace, normalized query, timespan bucket);
+# pass no_cache to bypass. The timespan is relative to now, so a short TTL
+# keeps polled results fresh. Only touched from the event loop, so no lock.
+KQL_CACHE_TTL_SECONDS = 60
+_kql_cache = TTLCache(maxsize=128, ttl=KQL_CACHE_TTL_SECONDS)
+
+# validate_workspace_connection responses by workspace: successes are reused
+# for a minute, failures briefly so a retry loop doesn't hammer the service
+VALIDATION_OK_TTL_SECONDS = 60
+VALIDATION_FAILURE_TTL_SECONDS = 5
+_validated_workspaces = TTLCache(maxsize=256, ttl=VALIDATION_OK_TTL_SECONDS)
+_failed_validations = TTLCache(maxsize=256, ttl=VALIDATION_FAILURE_TTL_SECONDS)
+
+# String literals (kept verbatim) or runs of whitespace and // comments
+_KQL_TOKENS = re.compile(
+    r"""(@'[^']*'|@"[^"]*"|'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")|((?:\s|//[^\n]*)+)"""
+)
+
+
+def normalize_kql(query: str) -> str:
+    """Collapse whitespace and drop // comments outside string literals.
+
+    Case is preserved: KQL table, column and operator names are case-sensitive.
+    """
+    return _KQL_TOKENS.sub(lambda m: m.group(1) or " ", query).strip()
+
+
+# A normalized query ending in "| take N" or "| limit N"
+_TAKE_SUFFIX = re.compile(r"(?P<base>.+?) ?\| ?(?:take|limit) (?P<count>\d+)")
+
+
+def cached_subset(workspace_id: str, normalized: str, bucket: float) -> Optional[dict]:
+    """Serve `<query> | take N` from a cached result of `<query>`, if there is one.
+
+    `take` returns any N rows, so the first N rows of the complete cached
+    result answer it. Only single-table results qualify; other suffixes
+    (e.g. extra `where` clauses) still go to Log Analytics.
+    """
+    match = _TAKE_SUFFIX.fullmatch(normalized)
+    if match is None:
+        return None
+    superset = _kql_cache.get((workspace_id, match["base"], bucket))
+    if superset is None or len(superset.get("tables", [])) != 1:
+        return None
+    count = int(match["count"])
+    table = superset["tables"][0]
+    rows = table["rows"][:count]
+    return {**superset, "tables": [{**table, "rows": rows, "row_count": len(rows)}], "returned_rows_count": len(rows)}
+
+
+class KqlBatcher:
+    """Coalesce concurrent KQL tool calls into `query_batch` round trips.
+
+    Callers await `submit()`; a background task collects requests for up to
+    `window` seconds (and at most `max_batch` of them), runs them as a single
+    batch in a worker thread and resolves each caller's future with its own
+    canonical exec_result dict.
+    """
+
+    def __init__(self, window: float = KQL_BATCH_WINDOW_SEC, max_batch: int = KQL_BATCH_MAX):
+        self._window = window
+        self._max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+    async def submit(self, kql: str, workspace_id: str, timespan: Any) -> dict:
+        """Queue one query and wait for its result."""
+        if self._collector is None:
+            # Created on first use so they bind to the server's running loop
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.create_task(self._collect())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(({"kql": kql, "workspace_id": workspace_id, "timespan": timespan}, future))
+        return await future
+
+    async def _collect(self) -> None:
+        while True:
+            pending = [await self._queue.get()]
+            # Give concurrent callers a short window to join this batch
+            await asyncio.sleep(self._window)
+            while len(pending) < self._max_batch and not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            # Dispatch without waiting so the next batch can start collecting
+            task = asyncio.create_task(self._dispatch(pending))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, pending: list) -> None:
+        try:
+            async with _query_slots:
+                results = await asyncio.to_thread(_run_batch, [request for request, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+batcher = KqlBatcher()
+
+
 def format_table_as_text(table_data: dict) -> str:
     """Format query results as a readable text table"""
     columns = table_data.get("columns", [])
@@ -42,16 +178,38 @@ def format_table_as_text(table_data: dict) -> str:
     header = " | ".join(columns)
     separator = "-" * len(header)
 
-    # Create rows
-    formatted_rows = []
-    for row in rows:
-        row_str = " | ".join(str(cell) if cell is not None else "NULL" for cell in row)
-        formatted_rows.append(row_str)
+    # Create rows in one pass over the raw cells (list comprehensions join
+    # faster than generators; `str` is bound locally for the inner loop)
+    to_str = str
+    formatted_rows = [
+        " | ".join(["NULL" if cell is None else to_str(cell) for cell in row]) for row in rows
+    ]
 
     return f"{header}\n{separator}\n" + "\n".join(formatted_rows)
 
 
-# Use `is_success` from utils.kql_exec for status normalization and checks
+# KQL example files per get_kql_examples scenario, relative to the parent of
+# the working directory
+_EXAMPLE_FILES = {
+    "requests": "../app_insights_capsule/kql_examples/app_requests_kql_examples.md",
+    "exceptions": "../app_insights_capsule/kql_examples/app_exceptions_kql_examples.md",
+    "traces": "../app_insights_capsule/kql_examples/app_traces_kql_examples.md",
+    "dependencies": "../app_insights_capsule/kql_examples/app_dependencies_kql_examples.md",
+    "custom_events": "../app_insights_capsule/kql_examples/app_custom_events_kql_examples.md",
+    "performance": "../app_insights_capsule/kql_examples/app_performance_kql_examples.md",
+    "usage": "../usage_kql_examples.md",
+}
+# File contents by scenario, read on first request
+_example_cache: dict[str, str] = {}
+
+
+# Use `kql().is_success` from utils.kql_exec for status normalization and checks
+
+# Cell types passed through unchanged; anything else is stringified
+_JSON_SCALARS = (str, int, float, bool)
+_JSON_SCALAR_TYPES = frozenset({str, int, float, bool, type(None)})
+# KQL column types whose cells the SDK returns as JSON scalars (or None)
+_SCALAR_KQL_TYPES = frozenset({"bool", "boolean", "int", "long", "real", "double", "decimal", "string", "guid", "timespan"})
 
 
 def process_query_results(response) -> list:
@@ -66,35 +224,33 @@ def process_query_results(response) -> list:
         raw_tables = getattr(response, "tables", [])
         status = getattr(response, "status", None)
 
-    if not is_success(status):
+    if not kql().is_success(status):
         return tables
 
     for i, table in enumerate(raw_tables):
-        columns = []
-        cols_iter = table.get("columns") if isinstance(table, dict) else getattr(table, "columns", [])
-        for col in cols_iter:
-            if hasattr(col, "name"):
-                columns.append(col.name)
-            elif isinstance(col, dict) and "name" in col:
-                columns.append(col["name"])
-            else:
-                columns.append(str(col))
+        columns = kql().column_names(table.get("columns") if isinstance(table, dict) else getattr(table, "columns", []))
 
-        # Process rows with type conversion
-        processed_rows = []
+        # Copy rows in bulk, then convert only the columns whose cell types
+        # are not all JSON scalars (typically datetime and dynamic columns)
         raw_rows = table.get("rows") if isinstance(table, dict) else getattr(table, "rows", [])
-
-        for row in raw_rows:
-            processed_row = []
-            for cell in row:
-                if cell is None:
-                    processed_row.append(None)
-                elif isinstance(cell, (str, int, float, bool)):
-                    processed_row.append(cell)
-                else:
-                    # Convert complex types to string
-                    processed_row.append(str(cell))
-            processed_rows.append(processed_row)
+        column_types = table.get("column_types") if isinstance(table, dict) else getattr(table, "columns_types", None)
+        # Each output row is allocated at full width in one list() call
+        processed_rows = list(map(list, raw_rows))
+        if processed_rows:
+            # Bind builtins and module constants locally for the cell loops
+            cell_type, is_scalar, to_str = type, isinstance, str
+            scalars, scalar_types = _JSON_SCALARS, _JSON_SCALAR_TYPES
+            for j in range(len(processed_rows[0])):
+                # Scalar-typed columns are taken as-is without looking at cells
+                if column_types and column_types[j] in _SCALAR_KQL_TYPES:
+                    continue
+                if scalar_types.issuperset({cell_type(row[j]) for row in processed_rows}):
+                    continue
+                for row in processed_rows:
+                    cell = row[j]
+                    if cell is not None and not is_scalar(cell, scalars):
+                        # Convert complex types to string
+                        row[j] = to_str(cell)
 
         table_dict = {
             "name": table.get("name") if isinstance(table, dict) else getattr(table, "name", f"table_{i}"),
@@ -107,71 +263,166 @@ def process_query_results(response) -> list:
     return tables
 
 
-@server.list_tools()
-async def handle_list_tools() -> list[Tool]:
-    """List available tools"""
-    return [
-        Tool(
-            name="execute_kql_query",
-            description="Execute a KQL query against an Azure Log Analytics workspace",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "workspace_id": {
-                        "type": "string",
-                        "description": "The Log Analytics workspace ID (GUID)",
-                    },
-                    "query": {
-                        "type": "string",
-                        "description": "The KQL query to execute",
-                    },
-                    "timespan_hours": {
-                        "type": "number",
-                        "description": "Number of hours to look back (optional, defaults to 1 hour)",
-                        "default": 1,
-                    },
+# The tool schemas are static, so they are built once at import time
+_TOOLS = [
+    Tool(
+        name="execute_kql_query",
+        description="Execute a KQL query against an Azure Log Analytics workspace",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "workspace_id": {
+                    "type": "string",
+                    "description": "The Log Analytics workspace ID (GUID)",
                 },
-                "required": ["workspace_id", "query"],
-            },
-        ),
-        Tool(
-            name="get_kql_examples",
-            description="Get KQL query examples for different Application Insights scenarios",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "scenario": {
-                        "type": "string",
-                        "enum": [
-                            "requests",
-                            "exceptions",
-                            "traces",
-                            "dependencies",
-                            "custom_events",
-                            "performance",
-                            "usage",
-                        ],
-                        "description": "The Application Insights scenario to get examples for",
-                    }
+                "query": {
+                    "type": "string",
+                    "description": "The KQL query to execute",
+                },
+                "timespan_hours": {
+                    "type": "number",
+                    "description": "Number of hours to look back (optional, defaults to 1 hour)",
+                    "default": 1,
+                },
+                "output_format": {
+                    "type": "string",
+                    "enum": ["text", "json"],
+                    "description": "Return a text table (default) or the tables as JSON",
+                    "default": "text",
+                },
+                "no_cache": {
+                    "type": "boolean",
+                    "description": "Bypass the short-lived result cache (optional)",
+                    "default": False,
                 },
-                "required": ["scenario"],
             },
-        ),
-        Tool(
-            name="validate_workspace_connection",
-            description="Test connection to an Azure Log Analytics workspace",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "workspace_id": {
-                        "type": "string",
-                        "description": "The Log Analytics workspace ID (GUID) to test",
-                    }
+            "required": ["workspace_id", "query"],
+        },
+    ),
+    Tool(
+        name="execute_kql_queries",
+        description="Execute several KQL queries concurrently; returns one result per query, in order",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "queries": {
+                    "type": "array",
+                    "description": "Queries to run; each item takes the same arguments as execute_kql_query",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "workspace_id": {"type": "string"},
+                            "query": {"type": "string"},
+                            "timespan_hours": {"type": "number", "default": 1},
+                            "output_format": {"type": "string", "enum": ["text", "json"], "default": "text"},
+                            "no_cache": {"type": "boolean", "default": False},
+                        },
+                        "required": ["workspace_id", "query"],
+                    },
                 },
-                "required": ["workspace_id"],
             },
-        ),
-    ]
+            "required": ["queries"],
+        },
+    ),
+    Tool(
+        name="get_kql_examples",
+        description="Get KQL query examples for different Application Insights scenarios",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "scenario": {
+                    "type": "string",
+                    "enum": [
+                        "requests",
+                        "exceptions",
+                        "traces",
+                        "dependencies",
+                        "custom_events",
+                        "performance",
+                        "usage",
+                    ],
+                    "description": "The Application Insights scenario to get examples for",
+                }
+            },
+            "required": ["scenario"],
+        },
+    ),
+    Tool(
+        name="validate_workspace_connection",
+        description="Test connection to an Azure Log Analytics workspace",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "workspace_id": {
+                    "type": "string",
+                    "description": "The Log Analytics workspace ID (GUID) to test",
+                }
+            },
+            "required": ["workspace_id"],
+        },
+    ),
+]
+
+
+@server.list_tools()
+async def handle_list_tools() -> list[Tool]:
+    """List available tools"""
+    return _TOOLS
+
+
+async def run_kql_tool(arguments: dict) -> list[TextContent]:
+    """Run one execute_kql_query tool call (also used per item by execute_kql_queries)"""
+    try:
+        workspace_id = arguments["workspace_id"]
+        query = arguments["query"]
+        timespan_hours = arguments.get("timespan_hours", 1)
+
+        logger.info(f"Executing KQL query for workspace: {workspace_id}")
+        logger.info(f"Query: {query}")
+
+        # Set up timespan
+        end_time = datetime.now(timezone.utc)
+        start_time = end_time - timedelta(hours=timespan_hours)
+        timespan = (start_time, end_time)
+
+        # Repeated polls of the same query within the TTL reuse the result,
+        # and "| take N" drill-downs are cut from a cached full result
+        cache_key = (workspace_id, normalize_kql(query), round(timespan_hours * 4) / 4)
+        exec_result = None
+        if not arguments.get("no_cache"):
+            exec_result = _kql_cache.get(cache_key) or cached_subset(*cache_key)
+
+        if exec_result is None:
+            # Execute query via the batcher so concurrent calls share one round trip
+            exec_result = await batcher.submit(query, workspace_id, timespan)
+            if kql().is_success(exec_result.get("exec_stats", {}).get("status")):
+                _kql_cache[cache_key] = exec_result
+
+        tables = exec_result.get("tables", [])
+        status = exec_result.get("exec_stats", {}).get("status")
+
+        if not kql().is_success(status) or not tables:
+            # Surface the partial/failure error recorded by kql_exec, if any
+            error_msg = exec_result.get("exec_stats", {}).get("error", "No data returned or query failed")
+            return [TextContent(type="text", text=f"Error: {error_msg}")]
+
+        if arguments.get("output_format") == "json":
+            # Serialize the JSON-safe tables in one pass
+            payload = orjson.dumps(process_query_results(exec_result), option=orjson.OPT_NON_STR_KEYS)
+            return [TextContent(type="text", text=payload.decode())]
+
+        # Format results as text; collect parts and join once
+        parts = [f"Query executed successfully. Found {len(tables)} table(s):\n"]
+        for i, table in enumerate(tables):
+            if i > 0:
+                parts.append("")
+            parts.append(f"Table {i+1} ({table['row_count']} rows):\n{format_table_as_text(table)}")
+
+        return [TextContent(type="text", text="\n".join(parts))]
+
+    except Exception as e:
+        logger.error(f"Error executing KQL query: {e}")
+        return [TextContent(type="text", text=f"Error executing query: {str(e)}")]
 
 
 @server.call_tool()
@@ -181,65 +432,26 @@ async def handle_call_tool(
     """Handle tool calls"""
 
     if name == "execute_kql_query":
+        return await run_kql_tool(arguments)
+
+    elif name == "execute_kql_queries":
         try:
-            workspace_id = arguments["workspace_id"]
-            query = arguments["query"]
-            timespan_hours = arguments.get("timespan_hours", 1)
-
-            logger.info(f"Executing KQL query for workspace: {workspace_id}")
-            logger.info(f"Query: {query}")
-
-            # Set up timespan
-            end_time = datetime.now(timezone.utc)
-            start_time = end_time - timedelta(hours=timespan_hours)
-            timespan = (start_time, end_time)
-
-            # Execute query via canonical helper (prefer injected client)
-            exec_result = execute_kql_query(kql=query, workspace_id=workspace_id, client=client, timespan=timespan)
-            tables = exec_result.get("tables", [])
-            status = exec_result.get("exec_stats", {}).get("status")
-
-            if not _status_ok(status) or not tables:
-                # Try to surface partial_error from any SDK response if present
-                if isinstance(exec_result, dict):
-                    error_msg = exec_result.get("exec_stats", {}).get("error", "No data returned or query failed")
-                else:
-                    error_msg = getattr(response, "partial_error", "No data returned or query failed")
-                return [TextContent(type="text", text=f"Error: {error_msg}")]
-
-            # Format results as text
-            result_text = (
-                f"Query executed successfully. Found {len(tables)} table(s):\n\n"
-            )
-
-            for i, table in enumerate(tables):
-                if i > 0:
-                    result_text += "\n\n"
-                result_text += f"Table {i+1} ({table['row_count']} rows):\n"
-                result_text += format_table_as_text(table)
-
-            return [TextContent(type="text", text=result_text)]
+            queries = arguments["queries"]
+            logger.info(f"Executing {len(queries)} KQL queries")
+            # Run all queries at once; the batcher groups them into
+            # query_batch requests and _query_slots bounds the round trips
+            results = await asyncio.gather(*(run_kql_tool(q) for q in queries))
+            return [content for result in results for content in result]
 
         except Exception as e:
-            logger.error(f"Error executing KQL query: {e}")
-            return [TextContent(type="text", text=f"Error executing query: {str(e)}")]
+            logger.error(f"Error executing KQL queries: {e}")
+            return [TextContent(type="text", text=f"Error executing queries: {str(e)}")]
 
     elif name == "get_kql_examples":
         try:
             scenario = arguments["scenario"]
 
-            # Map scenarios to example files
-            example_files = {
-                "requests": "../app_insights_capsule/kql_examples/app_requests_kql_examples.md",
-                "exceptions": "../app_insights_capsule/kql_examples/app_exceptions_kql_examples.md",
-                "traces": "../app_insights_capsule/kql_examples/app_traces_kql_examples.md",
-                "dependencies": "../app_insights_capsule/kql_examples/app_dependencies_kql_examples.md",
-                "custom_events": "../app_insights_capsule/kql_examples/app_custom_events_kql_examples.md",
-                "performance": "../app_insights_capsule/kql_examples/app_performance_kql_examples.md",
-                "usage": "../usage_kql_examples.md",
-            }
-
-            filename = example_files.get(scenario)
+            filename = _EXAMPLE_FILES.get(scenario)
             if not filename:
                 return [
                     TextContent(
@@ -247,10 +459,12 @@ async def handle_call_tool(
                     )
                 ]
 
-            # Read the example file
+            # Read the example file once; later calls are served from memory
             try:
-                with open(f"../{filename}", "r", encoding="utf-8") as f:
-                    content = f.read()
+                content = _example_cache.get(scenario)
+                if content is None:
+                    with open(f"../{filename}", "r", encoding="utf-8") as f:
+                        content = _example_cache[scenario] = f.read()
                 return [
                     TextContent(
                         type="text",
@@ -270,37 +484,37 @@ async def handle_call_tool(
         try:
             workspace_id = arguments["workspace_id"]
 
+            # A recent outcome for this workspace is returned without a probe
+            cached = _validated_workspaces.get(workspace_id) or _failed_validations.get(workspace_id)
+            if cached is not None:
+                return [TextContent(type="text", text=cached)]
+
             logger.info(f"Testing connection to workspace: {workspace_id}")
 
             # Test with a simple query
             test_query = "print 'Connection test successful'"
 
-            response = client.query_workspace(
-                workspace_id=workspace_id, query=test_query, timespan=None
-            )
+            async with _query_slots:
+                # The first call imports the SDK and builds the client
+                client = await asyncio.to_thread(get_client)
+                response = await asyncio.to_thread(
+                    client.query_workspace, workspace_id=workspace_id, query=test_query, timespan=None
+                )
 
             status = getattr(response, "status", None)
-            if _status_ok(status):
-                return [
-                    TextContent(
-                        type="text",
-                        text=f"✅ Successfully connected to workspace: {workspace_id}",
-                    )
-                ]
+            if kql().is_success(status):
+                text = _validated_workspaces[workspace_id] = f"✅ Successfully connected to workspace: {workspace_id}"
             else:
                 error_msg = getattr(response, "partial_error", "Unknown error")
-                return [
-                    TextContent(
-                        type="text",
-                        text=f"❌ Failed to connect to workspace: {workspace_id}\nError: {error_msg}",
-                    )
-                ]
+                text = _failed_validations[workspace_id] = f"❌ Failed to connect to workspace: {workspace_id}\nError: {error_msg}"
+            return [TextContent(type="text", text=text)]
 
         except Exception as e:
             logger.error(f"Error testing workspace connection: {e}")
-            return [
-                TextContent(type="text", text=f"❌ Connection test failed: {str(e)}")
-            ]
+            text = f"❌ Connection test failed: {str(e)}"
+            if "workspace_id" in arguments:
+                _failed_validations[arguments["workspace_id"]] = text
+            return [TextContent(type="text", text=text)]
 
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
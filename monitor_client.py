@@ -5,18 +5,142 @@ All methods are heavily commented for clarity and learning.
 """
 from azure.identity import AzureCliCredential, DefaultAzureCredential
 from azure.core.credentials import AccessToken
-from azure.monitor.query import LogsQueryClient, LogsQueryStatus
+from azure.core.pipeline.transport import RequestsTransport
+from azure.monitor.query import LogsBatchQuery, LogsQueryClient, LogsQueryStatus
+from cachetools import TTLCache
 from datetime import datetime, timedelta
+import base64
+import hashlib
+import json
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+from kql_exec import column_names
+
+try:  # Optional: pyarrow tables from query_log_analytics(format="arrow")
+    import pyarrow as pa  # type: ignore
+    # Arrow types for Kusto column types; other types are inferred by pyarrow
+    KUSTO_ARROW_TYPES = {
+        'string': pa.string(),
+        'guid': pa.string(),
+        'timespan': pa.string(),
+        'bool': pa.bool_(),
+        'int': pa.int32(),
+        'long': pa.int64(),
+        'real': pa.float64(),
+        'datetime': pa.timestamp('us', tz='UTC'),
+    }
+except Exception:  # pragma: no cover - dict results only
+    pa = None  # type: ignore
+    KUSTO_ARROW_TYPES = {}
+
+logger = logging.getLogger(__name__)
+
+# Warn when a user token is this close to expiry (seconds)
+TOKEN_EXPIRY_WARNING_SECONDS = 300
+
+# Keep-alive connections held open to the Log Analytics endpoint. requests'
+# default pool (10) is smaller than the number of gunicorn threads per worker,
+# so concurrent queries would otherwise keep opening fresh TLS connections.
+LOGS_POOL_MAXSIZE = 64
+
+
+def _pooled_transport():
+    """Build an azure-core transport whose HTTPS pool fits concurrent queries."""
+    session = requests.Session()
+    # Retries stay with azure-core's RetryPolicy; the adapter only sizes the pool
+    adapter = HTTPAdapter(pool_connections=LOGS_POOL_MAXSIZE, pool_maxsize=LOGS_POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    return RequestsTransport(session=session, session_owner=True)
+
+def _token_expires_on(access_token):
+    """Read the `exp` claim (epoch seconds) from a JWT access token, or None."""
+    try:
+        payload = access_token.split(".")[1]
+        # JWT segments are base64url without padding
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return int(claims["exp"])
+    except Exception:
+        return None
+
+def arrow_column(values, arrow_type=None):
+    """Build a pyarrow array, falling back to strings for mixed or unparsed values."""
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
 
 class UserTokenCredential:
     """Credential that uses a user's access token from Azure AD authentication."""
     def __init__(self, access_token):
         self.access_token = access_token
+        # Report the token's real expiry; if it can't be read, assume 1 hour
+        # (Azure AD tokens typically last 1 hour)
+        expires_on = _token_expires_on(access_token)
+        if expires_on is None:
+            expires_on = int((datetime.now() + timedelta(hours=1)).timestamp())
+        self._token = AccessToken(access_token, expires_on)
+        self._expiry_warned = False
     
     def get_token(self, *scopes, **kwargs):
-        # Return token that expires in 1 hour (Azure AD tokens typically last 1 hour)
-        expires_on = int((datetime.now() + timedelta(hours=1)).timestamp())
-        return AccessToken(self.access_token, expires_on)
+        # The same immutable AccessToken is returned on every call. Near expiry
+        # azure-core asks again on every request, so warn only once.
+        if not self._expiry_warned:
+            remaining = self._token.expires_on - datetime.now().timestamp()
+            if remaining < TOKEN_EXPIRY_WARNING_SECONDS:
+                self._expiry_warned = True
+                logger.warning("User access token expires in %d seconds; sign in again to refresh it", remaining)
+        return self._token
+
+# (credential, LogsQueryClient) pairs shared by every AzureMonitorAgent: the
+# default one is built once (the CLI probe spawns `az`), user-token ones are
+# keyed by token digest and dropped after a token's typical 1 hour lifetime
+_default_client = None
+# Held while the default credential is probed (can take seconds), so it
+# only ever blocks other callers wanting the default client
+_default_client_lock = threading.Lock()
+_user_clients = TTLCache(maxsize=64, ttl=3600)
+# Guards _user_clients lookups and inserts only
+_user_clients_lock = threading.Lock()
+
+
+def _default_credential():
+    """Prefer Azure CLI credentials, falling back to DefaultAzureCredential."""
+    try:
+        # Try Azure CLI credentials first
+        credential = AzureCliCredential()
+        # This will raise if az is not installed or not logged in
+        _ = credential.get_token("https://management.azure.com/.default")
+        return credential
+    except Exception:
+        # Fallback to DefaultAzureCredential (env vars, managed identity, etc.)
+        return DefaultAzureCredential()
+
+
+def _get_client(user_token=None):
+    """Return the cached (credential, LogsQueryClient) pair, creating it on first use."""
+    global _default_client
+    if not user_token:
+        if _default_client is None:
+            with _default_client_lock:
+                if _default_client is None:
+                    credential = _default_credential()
+                    # Share one pooled HTTP transport across all queries
+                    _default_client = (credential, LogsQueryClient(credential, transport=_pooled_transport()))
+        return _default_client
+
+    key = hashlib.blake2b(user_token.encode(), digest_size=16).digest()
+    with _user_clients_lock:
+        pair = _user_clients.get(key)
+    if pair is None:
+        credential = UserTokenCredential(user_token)
+        pair = (credential, LogsQueryClient(credential, transport=_pooled_transport()))
+        with _user_clients_lock:
+            # Another thread may have built one meanwhile; keep the first
+            pair = _user_clients.setdefault(key, pair)
+    return pair
 
 class AzureMonitorAgent:
     def __init__(self, user_token=None):
@@ -28,30 +152,24 @@ class AzureMonitorAgent:
                        If provided, queries will run as that user.
                        If not provided, uses CLI credentials or managed identity.
         """
-        if user_token:
-            # Use the user's token from Azure AD authentication
-            self.credential = UserTokenCredential(user_token)
-        else:
-            try:
-                # Try Azure CLI credentials first
-                self.credential = AzureCliCredential()
-                # This will raise if az is not installed or not logged in
-                _ = self.credential.get_token("https://management.azure.com/.default")
-            except Exception:
-                # Fallback to DefaultAzureCredential (env vars, managed identity, etc.)
-                self.credential = DefaultAzureCredential()
-        self.client = LogsQueryClient(self.credential)
-
-    def query_log_analytics(self, workspace_id, kql_query, timespan=None):
+        # With a user token, queries run as that user; otherwise CLI credentials
+        # or managed identity. Credentials and clients are cached per identity.
+        self.credential, self.client = _get_client(user_token)
+
+    def query_log_analytics(self, workspace_id, kql_query, timespan=None, format="dict"):
         """
         Run a KQL query against a Log Analytics workspace.
         Args:
             workspace_id (str): The Log Analytics workspace ID (GUID).
             kql_query (str): The Kusto Query Language (KQL) query to run.
             timespan (str or tuple): ISO8601 duration or (start, end) tuple.
+            format (str): "dict" for {name, columns, rows} tables, or "arrow"
+                          for {name, table} with a pyarrow.Table (needs pyarrow).
         Returns:
             dict: Query results or error message.
         """
+        if format == "arrow" and pa is None:
+            return {"error": "pyarrow is not installed"}
         try:
             response = self.client.query_workspace(
                 workspace_id=workspace_id,
@@ -60,28 +178,77 @@ class AzureMonitorAgent:
             )
             # Convert LogsTable objects to dicts manually
             if response.status == LogsQueryStatus.SUCCESS:
-                tables = []
-                for table in response.tables:
-                    # Defensive: skip if table is not a LogsTable object
-                    if not hasattr(table, 'name') or not hasattr(table, 'columns') or not hasattr(table, 'rows'):
-                        continue
-                    # Defensive: columns may be a list of dicts or strings, handle both
-                    columns = []
-                    for col in getattr(table, 'columns', []):
-                        if hasattr(col, 'name'):
-                            columns.append(col.name)
-                        elif isinstance(col, dict) and 'name' in col:
-                            columns.append(col['name'])
-                        else:
-                            columns.append(str(col))
-                    table_dict = {
-                        'name': getattr(table, 'name', ''),
-                        'columns': columns,
-                        'rows': getattr(table, 'rows', [])
-                    }
-                    tables.append(table_dict)
-                return {"tables": tables}
+                if format == "arrow":
+                    return {"tables": self._tables_to_arrow(response.tables)}
+                return {"tables": self._tables_to_dicts(response.tables)}
             else:
                 return {"error": getattr(response, 'partial_error', None)}
         except Exception as e:
             return {"error": str(e)}
+
+    def query_log_analytics_batch(self, queries):
+        """
+        Run several KQL queries in a single HTTP request.
+        Args:
+            queries (list): Dicts with workspace_id, kql_query and optional timespan,
+                            as accepted by query_log_analytics.
+        Returns:
+            list: One result dict per query, in order, each shaped like query_log_analytics' return value.
+        """
+        try:
+            batch = [
+                LogsBatchQuery(
+                    workspace_id=q["workspace_id"],
+                    query=q["kql_query"],
+                    timespan=q.get("timespan")
+                )
+                for q in queries
+            ]
+            responses = self.client.query_batch(batch)
+        except Exception as e:
+            return [{"error": str(e)} for _ in queries]
+
+        results = []
+        for response in responses:
+            if getattr(response, 'status', None) == LogsQueryStatus.SUCCESS:
+                results.append({"tables": self._tables_to_dicts(response.tables)})
+            else:
+                # Partial results carry partial_error; failed queries are LogsQueryError objects
+                error = getattr(response, 'partial_error', None) or getattr(response, 'message', None)
+                results.append({"error": str(error) if error is not None else "Query failed"})
+        return results
+
+    @staticmethod
+    def _tables_to_arrow(response_tables):
+        """Convert SDK LogsTable objects to {name, table} dicts holding pyarrow Tables."""
+        tables = []
+        for table in response_tables:
+            columns = column_names(table.columns)
+            column_types = getattr(table, 'columns_types', None) or [None] * len(columns)
+            # Transpose rows into columns once, then build one typed array per column
+            values = list(zip(*table.rows)) if table.rows else [()] * len(columns)
+            arrays = [
+                arrow_column(list(column), KUSTO_ARROW_TYPES.get(column_type))
+                for column, column_type in zip(values, column_types)
+            ]
+            tables.append({
+                'name': getattr(table, 'name', ''),
+                'table': pa.Table.from_arrays(arrays, names=columns)
+            })
+        return tables
+
+    @staticmethod
+    def _tables_to_dicts(response_tables):
+        """Convert SDK LogsTable objects to {name, columns, rows} dicts."""
+        tables = []
+        for table in response_tables:
+            # Defensive: skip if table is not a LogsTable object
+            if not hasattr(table, 'name') or not hasattr(table, 'columns') or not hasattr(table, 'rows'):
+                continue
+            table_dict = {
+                'name': getattr(table, 'name', ''),
+                'columns': column_names(table.columns),
+                'rows': getattr(table, 'rows', [])
+            }
+            tables.append(table_dict)
+        return tables
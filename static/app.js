@@ -194,7 +194,7 @@ async function executeQuery() {
             currentQuery = query;
             displayResults(data);
             queryTime.textContent = `${elapsed}s`;
-            resultsCount.textContent = `${data.total_rows} rows`;
+            resultsCount.textContent = `${data.total_rows} rows${data.truncated ? ' (truncated)' : ''}`;
             exportCsvBtn.disabled = false;
             exportJsonBtn.disabled = false;
             showToast(`Query completed: ${data.total_rows} rows returned`, 'success');
@@ -431,8 +431,18 @@ async function generateExplanation(query, data) {
         </div>
     `;
     
+    const showExplainError = (message) => {
+        explanationContainer.innerHTML = `
+            <div class="explanation-error">
+                <i class="fas fa-exclamation-circle"></i>
+                <span>Failed to generate explanation: ${escapeHtml(message)}</span>
+            </div>
+        `;
+    };
+    
     try {
-        const response = await fetch('/api/explain', {
+        // Stream the explanation (Server-Sent Events) so text appears as it is generated
+        const response = await fetch('/api/explain-stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -443,33 +453,64 @@ async function generateExplanation(query, data) {
             })
         });
         
-        const result = await response.json();
+        if (!response.ok || !response.body) {
+            const result = await response.json();
+            showExplainError(result.error || `HTTP ${response.status}`);
+            return;
+        }
         
-        if (result.error) {
-            explanationContainer.innerHTML = `
-                <div class="explanation-error">
-                    <i class="fas fa-exclamation-circle"></i>
-                    <span>Failed to generate explanation: ${escapeHtml(result.error)}</span>
-                </div>
-            `;
-        } else {
-            // Parse markdown and display
-            const htmlContent = marked.parse(result.explanation);
-            const usedModel = result.model || selectedModel;
-            explanationContainer.innerHTML = `
-                <div class="explanation-model-badge">
-                    <i class="fas fa-robot"></i> ${modelName}
-                </div>
-                <div class="explanation-content">${htmlContent}</div>
-            `;
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let explanation = '';
+        let contentEl = null;
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // SSE messages are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const message = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let payload = '';
+                for (const line of message.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) payload += line.slice(6);
+                }
+                if (!payload) continue;
+                const msg = JSON.parse(payload);
+                
+                if (event === 'error') {
+                    showExplainError(msg.error);
+                    return;
+                }
+                if (event === 'message' && msg.delta) {
+                    explanation += msg.delta;
+                    if (!contentEl) {
+                        explanationContainer.innerHTML = `
+                            <div class="explanation-model-badge">
+                                <i class="fas fa-robot"></i> ${modelName}
+                            </div>
+                            <div class="explanation-content"></div>
+                        `;
+                        contentEl = explanationContainer.querySelector('.explanation-content');
+                    }
+                    // Parse markdown and display
+                    contentEl.innerHTML = marked.parse(explanation);
+                }
+            }
+        }
+        
+        if (!explanation) {
+            showExplainError('Empty response from model');
         }
     } catch (error) {
-        explanationContainer.innerHTML = `
-            <div class="explanation-error">
-                <i class="fas fa-exclamation-circle"></i>
-                <span>Failed to generate explanation: ${error.message}</span>
-            </div>
-        `;
+        showExplainError(error.message);
     }
 }
 
@@ -0,0 +1,139 @@
+"""Tests for the Azure OpenAI Batch API judge jobs (/api/benchmark/batch-jobs)."""
+import uuid
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+import app as app_module
+
+
+def _output_line(custom_id, case_index):
+    scores = {dim: case_index + 1 for dim in app_module.DIMENSIONS}
+    scores["evaluatorNotes"] = f"case {case_index}"
+    body = {"choices": [{"message": {"content": "Scores:\n" + orjson.dumps(scores).decode()}}]}
+    return orjson.dumps({"custom_id": custom_id, "response": {"status_code": 200, "body": body}}).decode()
+
+
+class FakeOpenAI:
+    """Batch/file API double for one judge deployment."""
+
+    def __init__(self, model, output_lines):
+        self.model = model
+        self.output = "\n".join(output_lines)
+        self.submitted = []
+        self.cancelled = []
+        self.batch_id = f"batch-{model}"
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve, cancel=self.cancelled.append)
+
+    def _create_file(self, file, purpose):
+        self.submitted = [orjson.loads(line) for line in file[1].splitlines()]
+        return SimpleNamespace(id=f"file-{self.model}")
+
+    def _file_content(self, file_id):
+        return SimpleNamespace(text=self.output)
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id=self.batch_id)
+
+    def _retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, status="completed", output_file_id=f"out-{self.model}")
+
+
+@pytest.fixture
+def judges(monkeypatch):
+    # Out-of-order ids, a garbage line and out-of-range ids must not shift cases
+    fakes = {
+        "gpt-4": FakeOpenAI("gpt-4", [
+            _output_line("2", 2), "not json", _output_line("0", 0),
+            _output_line("7", 7), _output_line("-1", 0), _output_line("1", 1),
+        ]),
+        "o4-mini": FakeOpenAI("o4-mini", [_output_line("2", 2), _output_line("0", 0)]),
+    }
+    monkeypatch.setattr(app_module, "get_openai_client",
+                        lambda model: (fakes[model], model) if model in fakes else (None, None))
+    return fakes
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def _submit(client, count):
+    cases = [{"explanation": f"explanation {i}", "testCase": {"name": f"case {i}"}} for i in range(count)]
+    return client.post("/api/benchmark/batch-jobs", json={"cases": cases, "targetAudience": "sre"})
+
+
+def test_batch_output_is_grouped_by_custom_id(client, judges):
+    submitted = _submit(client, 3)
+    assert submitted.status_code == 202
+    assert submitted.json["judges"] == ["gpt-4", "o4-mini"]
+    assert [line["custom_id"] for line in judges["gpt-4"].submitted] == ["0", "1", "2"]
+
+    polled = client.get(f"/api/benchmark/batch-jobs/{submitted.json['jobId']}")
+
+    assert polled.status_code == 200
+    assert polled.json["status"] == "completed"
+    results = polled.json["results"]
+    assert len(results) == 3
+    for i, result in enumerate(results):
+        assert all(j["scores"]["evaluatorNotes"] == f"case {i}" for j in result["individualJudges"])
+        assert result["scores"]["consensus"]["statistics"]["faithfulness"]["mean"] == i + 1
+    assert results[0]["scores"]["judges"] == ["gpt-4", "o4-mini"]
+    assert results[1]["scores"]["judges"] == ["gpt-4"]
+
+
+def test_case_without_any_judge_output_reports_failure(client, judges):
+    judges["gpt-4"].output = _output_line("0", 0)
+    judges["o4-mini"].output = ""
+    job_id = _submit(client, 2).json["jobId"]
+
+    results = client.get(f"/api/benchmark/batch-jobs/{job_id}").json["results"]
+
+    assert results[0]["scores"]["judgeCount"] == 1
+    assert results[1] == {"error": "All judge models failed"}
+
+
+def test_forged_job_id_is_rejected(client, judges):
+    job_id = _submit(client, 2).json["jobId"]
+    payload, _, signature = job_id.partition(".")
+    forged = app_module._encode_batch_job({"count": 1000, "audiences": "1" * 1000, "batches": {}}).partition(".")[0]
+
+    assert client.get(f"/api/benchmark/batch-jobs/{forged}.{signature}").status_code == 400
+    assert client.get(f"/api/benchmark/batch-jobs/{payload}").status_code == 400
+
+
+def test_failed_submit_cancels_earlier_batches(client, judges):
+    def fail(**kwargs):
+        raise RuntimeError("deployment does not support batch")
+
+    judges["o4-mini"].batches.create = fail
+
+    response = _submit(client, 1)
+
+    assert response.status_code == 500
+    assert judges["gpt-4"].cancelled == ["batch-gpt-4"]
+
+
+def test_largest_job_id_fits_in_a_request_line(client, monkeypatch):
+    # Every judge configured, with batch ids as long as Azure's
+    fakes = {model: FakeOpenAI(model, []) for model in app_module.JUDGE_MODELS}
+    for fake in fakes.values():
+        fake.batch_id = f"batch_{uuid.uuid4()}"
+    monkeypatch.setattr(app_module, "get_openai_client", lambda model: (fakes[model], model))
+    audiences = list(app_module.AUDIENCE_WEIGHTS)
+    count = app_module.JUDGE_BATCH_MAX_CASES
+    cases = [{"explanation": f"explanation {i}", "targetAudience": audiences[i % len(audiences)]} for i in range(count)]
+
+    job_id = client.post("/api/benchmark/batch-jobs", json={"cases": cases}).json["jobId"]
+
+    # gunicorn's default limit_request_line
+    assert len(f"GET /api/benchmark/batch-jobs/{job_id} HTTP/1.1") <= 4094
+    job = app_module._decode_batch_job(job_id)
+    assert job["audiences"] == [case["targetAudience"] for case in cases]
+    assert job["batches"] == {model: fake.batch_id for model, fake in fakes.items()}
+    polled = client.get(f"/api/benchmark/batch-jobs/{job_id}")
+    assert polled.status_code == 200
+    assert len(polled.json["results"]) == count
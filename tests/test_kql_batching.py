@@ -0,0 +1,89 @@
+"""Tests for KQL batching: kql_exec.execute_kql_batch and mcp_server.KqlBatcher."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import kql_exec
+
+pytest.importorskip("azure.monitor.query")
+pytest.importorskip("mcp")
+import mcp_server  # noqa: E402
+
+
+class FakeLogsClient:
+    """query_batch double: each query returns one row echoing its text."""
+
+    def __init__(self, fail_on=None, error=None):
+        self.fail_on = fail_on
+        self.error = error
+        self.batches = []
+
+    def query_batch(self, queries, **kwargs):
+        if self.error is not None:
+            raise self.error
+        self.batches.append([q.body["query"] for q in queries])
+        responses = []
+        for q in queries:
+            text = q.body["query"]
+            if text == self.fail_on:
+                responses.append(SimpleNamespace(status="FAILURE", message="Syntax error"))
+            else:
+                table = SimpleNamespace(name="PrimaryResult", columns=["query"], columns_types=["string"], rows=[[text]])
+                responses.append(SimpleNamespace(status="SUCCESS", tables=[table]))
+        return responses
+
+
+def test_execute_kql_batch_keeps_order_and_reports_failures():
+    client = FakeLogsClient(fail_on="bad")
+    results = kql_exec.execute_kql_batch(
+        [{"kql": "A", "workspace_id": "w"}, {"kql": "bad", "workspace_id": "w"}, {"kql": "B", "workspace_id": "w2"}],
+        client=client,
+    )
+
+    assert client.batches == [["A", "bad", "B"]]
+    assert [r["exec_stats"]["status"] for r in results] == ["SUCCESS", "FAILURE", "SUCCESS"]
+    assert results[0]["tables"][0]["rows"] == [["A"]]
+    assert results[1]["exec_stats"]["error"] == "Syntax error"
+    assert results[2]["tables"][0]["rows"] == [["B"]]
+
+
+def test_execute_kql_batch_fans_out_request_errors():
+    client = FakeLogsClient(error=RuntimeError("throttled"))
+    results = kql_exec.execute_kql_batch([{"kql": q, "workspace_id": "w"} for q in "ABC"], client=client)
+
+    assert len(results) == 3
+    assert all(r["exec_stats"]["error"] == "throttled" and r["tables"] == [] for r in results)
+
+
+def test_batcher_orders_results_across_batches(monkeypatch):
+    client = FakeLogsClient()
+    monkeypatch.setattr(mcp_server, "_run_batch", lambda requests: kql_exec.execute_kql_batch(requests, client=client))
+    queries = [f"Q{i}" for i in range(25)]
+
+    async def run():
+        batcher = mcp_server.KqlBatcher()
+        return await asyncio.gather(*(batcher.submit(q, "w", None) for q in queries))
+
+    results = asyncio.run(run())
+
+    # At most KQL_BATCH_MAX per request, and every caller gets its own result
+    assert [len(b) for b in client.batches] == [10, 10, 5]
+    assert [q for batch in client.batches for q in batch] == queries
+    assert [r["tables"][0]["rows"][0][0] for r in results] == queries
+
+
+def test_batcher_fails_every_waiter_when_a_batch_raises(monkeypatch):
+    def fail(requests):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(mcp_server, "_run_batch", fail)
+
+    async def run():
+        batcher = mcp_server.KqlBatcher()
+        return await asyncio.gather(*(batcher.submit(f"Q{i}", "w", None) for i in range(12)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert len(results) == 12
+    assert all(isinstance(r, RuntimeError) and str(r) == "connection reset" for r in results)
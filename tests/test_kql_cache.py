@@ -0,0 +1,52 @@
+"""Tests for the MCP server's KQL result cache and '| take N' drill-downs."""
+import pytest
+
+pytest.importorskip("mcp")
+import mcp_server  # noqa: E402
+
+
+@pytest.fixture
+def kql_cache(monkeypatch):
+    cache = {}
+    monkeypatch.setattr(mcp_server, "_kql_cache", cache)
+    return cache
+
+
+def test_take_suffix_is_served_from_cached_superset(kql_cache):
+    rows = [[i] for i in range(5)]
+    kql_cache[("w", "T | where x > 1", 1.0)] = {
+        "tables": [{"name": "PrimaryResult", "columns": ["x"], "rows": rows, "row_count": 5}],
+        "returned_rows_count": 5,
+        "exec_stats": {"status": "SUCCESS"},
+    }
+
+    result = mcp_server.cached_subset("w", mcp_server.normalize_kql("T  | where x > 1 // drill down\n| take 2"), 1.0)
+
+    assert result["tables"][0]["rows"] == [[0], [1]]
+    assert result["tables"][0]["row_count"] == 2
+    assert result["returned_rows_count"] == 2
+    # The cached superset is left untouched
+    assert kql_cache[("w", "T | where x > 1", 1.0)]["tables"][0]["row_count"] == 5
+
+
+@pytest.mark.parametrize("workspace_id, query, bucket", [
+    ("w", "T | where x > 1 | where y == 2 | take 2", 1.0),  # extra filter
+    ("w", "T | where x > 1", 1.0),                          # no take suffix
+    ("other", "T | where x > 1 | take 2", 1.0),             # different workspace
+    ("w", "T | where x > 1 | take 2", 24.0),                # different timespan bucket
+])
+def test_take_suffix_misses(kql_cache, workspace_id, query, bucket):
+    kql_cache[("w", "T | where x > 1", 1.0)] = {
+        "tables": [{"name": "PrimaryResult", "columns": ["x"], "rows": [[1]], "row_count": 1}],
+        "returned_rows_count": 1,
+        "exec_stats": {"status": "SUCCESS"},
+    }
+
+    assert mcp_server.cached_subset(workspace_id, mcp_server.normalize_kql(query), bucket) is None
+
+
+def test_take_suffix_skips_multi_table_results(kql_cache):
+    table = {"name": "t", "columns": ["x"], "rows": [[1], [2]], "row_count": 2}
+    kql_cache[("w", "T", 1.0)] = {"tables": [table, table], "returned_rows_count": 4, "exec_stats": {"status": "SUCCESS"}}
+
+    assert mcp_server.cached_subset("w", "T | take 1", 1.0) is None
@@ -0,0 +1,33 @@
+"""Tests for the result dicts built by kql_exec.execute_kql_query."""
+import json
+from types import SimpleNamespace
+
+import kql_exec
+
+
+class FakeRow:
+    """Stands in for the SDK's LogsTableRow: iterable, but not JSON-serializable."""
+
+    def __init__(self, *values):
+        self._values = values
+
+    def __iter__(self):
+        return iter(self._values)
+
+
+def test_execute_kql_query_returns_json_friendly_tables():
+    table = SimpleNamespace(name="PrimaryResult", columns=["Computer", "Count"], columns_types=["string", "long"],
+                            rows=[FakeRow("vm1", 3), FakeRow("vm2", 5)])
+    client = SimpleNamespace(query_workspace=lambda **kwargs: SimpleNamespace(status="SUCCESS", tables=[table]))
+
+    result = kql_exec.execute_kql_query("T | summarize count() by Computer", "w", client=client)
+
+    assert result["tables"] == [{
+        "name": "PrimaryResult",
+        "columns": ["Computer", "Count"],
+        "column_types": ["string", "long"],
+        "rows": [["vm1", 3], ["vm2", 5]],
+        "row_count": 2,
+    }]
+    assert result["returned_rows_count"] == 2
+    json.dumps(result)
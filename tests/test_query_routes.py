@@ -0,0 +1,21 @@
+"""Request validation tests for /api/query and /api/query-batch."""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("max_rows", ["abc", None, [10]])
+@pytest.mark.parametrize("url, body", [
+    ("/api/query", {"workspace_id": "w", "query": "Heartbeat"}),
+    ("/api/query-batch", {"workspace_id": "w", "queries": [{"query": "Heartbeat"}]}),
+])
+def test_non_numeric_max_rows_is_rejected(client, url, body, max_rows):
+    response = client.post(url, json={**body, "max_rows": max_rows})
+
+    assert response.status_code == 400
+    assert response.json == {"error": "max_rows must be an integer"}
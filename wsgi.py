@@ -0,0 +1,16 @@
+"""
+WSGI entry point for production deployments.
+
+Handlers spend almost all of their time waiting on Log Analytics and
+Azure OpenAI, so serve the app with threaded workers to keep concurrent
+requests from queueing behind each other:
+
+    gunicorn wsgi:application
+
+Worker, thread and bind settings live in gunicorn.conf.py; the equivalent
+explicit command is:
+
+    gunicorn -w 4 -k gthread --threads 16 --timeout 120 --preload -b 0.0.0.0:5000 wsgi:application
+"""
+
+from app import app as application